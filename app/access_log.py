@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+ACCESS_LOG_BODY = os.getenv("ACCESS_LOG_BODY", "false").lower() in ("1", "true", "yes")
+ACCESS_LOG_BODY_MAX_BYTES = int(os.getenv("ACCESS_LOG_BODY_MAX_BYTES", 2048))
+
+# Champs masqués dans les corps JSON journalisés
+SENSITIVE_FIELDS = {"mdp", "password", "access_token", "refresh_token", "token"}
+
+access_logger = logging.getLogger("app.access")
+if not access_logger.handlers:
+    # Une ligne JSON brute par requête, sans le préfixe du logging racine
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    access_logger.addHandler(_handler)
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {
+            key: "***" if key.lower() in SENSITIVE_FIELDS else _redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class AccessLogMiddleware:
+    """
+    Middleware ASGI pur : une ligne JSON par requête (méthode, route, statut, durée, octets).
+    Le corps n'est jamais mis en mémoire tampon : les messages sont relayés tels quels,
+    seuls les `body_max_bytes` premiers octets d'un corps JSON sont copiés si demandé.
+    Les requêtes en erreur (5xx) sont toujours journalisées, quel que soit l'échantillonnage.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = ACCESS_LOG_SAMPLE_RATE,
+        log_body: bool = ACCESS_LOG_BODY,
+        body_max_bytes: int = ACCESS_LOG_BODY_MAX_BYTES,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.log_body = log_body
+        self.body_max_bytes = body_max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        content_type = _header(scope, b"content-type")
+        # Jamais de capture pour les uploads multipart : seul le JSON est journalisable
+        capture = sampled and self.log_body and content_type.startswith("application/json")
+        captured = bytearray()
+        state = {"status": 500, "bytes_in": 0, "bytes_out": 0, "truncated": False}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                state["bytes_in"] += len(chunk)
+                if capture and chunk:
+                    room = self.body_max_bytes - len(captured)
+                    if len(chunk) > room:
+                        state["truncated"] = True
+                    if room > 0:
+                        captured.extend(chunk[:room])
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["bytes_out"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if sampled or state["status"] >= 500:
+                self._log(scope, state, start, captured if capture else None)
+
+    def _log(self, scope, state, start, captured):
+        route = scope.get("route")
+        entry = {
+            "method": scope["method"],
+            "route": getattr(route, "path", None),
+            "path": scope["path"],
+            "status": state["status"],
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "bytes_in": state["bytes_in"],
+            "bytes_out": state["bytes_out"],
+        }
+        if captured is not None:
+            entry["body"] = self._format_body(captured, state["truncated"])
+        access_logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def _format_body(self, captured: bytearray, truncated: bool):
+        if not captured:
+            return None
+        if truncated:
+            # Un JSON tronqué ne peut pas être masqué de façon fiable : on ne le journalise pas
+            return {"omitted": "truncated", "max_bytes": self.body_max_bytes}
+        try:
+            return _redact(json.loads(captured))
+        except ValueError:
+            return {"omitted": "invalid_json"}
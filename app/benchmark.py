@@ -0,0 +1,560 @@
+"""
+Banc de charge de l'API v2, joué dans le process (app ASGI) ou contre un uvicorn local.
+
+    python -m app.benchmark --groups 5 --tents 200 --controls 10 --menus 100 \
+        --requests 500 --concurrency 20 --output bench.json [--compare precedent.json]
+
+Le seeder écrit dans la base de DATABASE_URL (groupes `bench-...`, supprimés en fin de
+banc sauf --keep) : à lancer sur une base de dev. Chaque groupe s'authentifie via
+/v2/auth/login, puis chaque scénario est joué par `concurrency` clients simultanés.
+Résultats : p50/p95/p99, requêtes/s et requêtes SQL par requête HTTP, en JSON.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from PIL import Image
+from sqlalchemy import delete, insert, select
+
+from app import images, models, sql_budget, storage
+from app.database import DB_ENGINE_MODE, SessionLocal
+from app.main import app
+from app.security import hash_password
+
+BENCH_PASSWORD = "bench-password"
+SEED_BATCH_SIZE = 10000
+
+# --- Jeu de données ---------------------------------------------------------
+
+def _insert_batches(db, model, rows):
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        db.execute(insert(model), rows[start:start + SEED_BATCH_SIZE])
+
+
+def seed(prefix: str, groups: int, tents: int, controls: int, menus: int, events: int, rng: random.Random) -> dict:
+    """
+    Insère `groups` groupes × `tents` tentes × `controls` contrôles, `menus` menus partagés,
+    et par groupe `events` événements planifiés sur 3 jours (midi / soir).
+    """
+    db = SessionLocal()
+    try:
+        # Un seul hash pour tous les groupes : argon2 est volontairement lent
+        mdp = hash_password(BENCH_PASSWORD)
+        groupe_ids = db.scalars(
+            insert(models.Groupe).returning(models.Groupe.id, sort_by_parameter_order=True),
+            [{"userlogin": f"{prefix}-{g}", "mdp": mdp, "nom": f"Bench {g}"} for g in range(groups)],
+        ).all()
+        menu_ids = db.scalars(
+            insert(models.Menu).returning(models.Menu.id, sort_by_parameter_order=True),
+            [
+                {
+                    "title": f"{prefix} menu {m}",
+                    "category": rng.choice(["plat", "dessert", "entrée"]),
+                    "ingredients": [{"nom": "riz", "quantite": "100", "unite": "g"}],
+                    "tags": [rng.choice(["végétarien", "rapide", "camp"])],
+                }
+                for m in range(menus)
+            ],
+        ).all()
+
+        users = []
+        start_date = datetime(2024, 1, 1)
+        for g, groupe_id in enumerate(groupe_ids):
+            tente_ids = db.scalars(
+                insert(models.Tente).returning(models.Tente.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "nom": f"Tente {t}",
+                        "etat": rng.choice(["ok", "abîmée", "à réparer"]),
+                        "nbPlaces": rng.randint(2, 8),
+                        "typeTente": "dôme",
+                        "couleurs": ["vert"],
+                        "groupeId": groupe_id,
+                        "estIntegree": False,
+                    }
+                    for t in range(tents)
+                ],
+            ).all()
+            _insert_batches(db, models.Controle, [
+                {
+                    "tenteId": tente_id,
+                    "userId": 1,
+                    "date": start_date + timedelta(days=30 * k + rng.randint(0, 29)),
+                    "checklist": {"sardines": True, "toile": rng.random() > 0.2},
+                    "remarques": "RAS",
+                    "groupeId": groupe_id,
+                }
+                for tente_id in tente_ids
+                for k in range(controls)
+            ])
+            evenement_ids = db.scalars(
+                insert(models.Evenement).returning(models.Evenement.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "nom": f"Camp {e}",
+                        "type": "camp",
+                        "date": start_date + timedelta(days=14 * e),
+                        "dateFin": start_date + timedelta(days=14 * e + 2),
+                        "tentesAssociees": rng.sample(list(tente_ids), min(5, len(tente_ids))),
+                        "groupeId": groupe_id,
+                    }
+                    for e in range(events)
+                ],
+            ).all()
+            if menu_ids:
+                _insert_batches(db, models.EventMenu, [
+                    {
+                        "event_id": evenement_id,
+                        "menu_id": rng.choice(menu_ids),
+                        "day_number": day,
+                        "type_repas": repas,
+                        "quantite_personnes": 12,
+                        "groupeId": groupe_id,
+                    }
+                    for evenement_id in evenement_ids
+                    for day in (1, 2, 3)
+                    for repas in ("midi", "soir")
+                ])
+            controle_ids = db.scalars(
+                select(models.Controle.id).filter(models.Controle.groupeId == groupe_id).limit(50)
+            ).all()
+            users.append({
+                "groupe_id": groupe_id,
+                "userlogin": f"{prefix}-{g}",
+                "tentes": list(tente_ids),
+                "evenements": list(evenement_ids),
+                "controles": list(controle_ids),
+            })
+        db.commit()
+        return {"users": users, "menus": list(menu_ids)}
+    finally:
+        db.close()
+
+
+def cleanup(seeded: dict):
+    groupe_ids = [user["groupe_id"] for user in seeded["users"]]
+    db = SessionLocal()
+    try:
+        for model in (
+            models.EventMenu,
+            models.Reservation,
+            models.Controle,
+            models.Evenement,
+            models.Tente,
+            models.CollectionVersion,
+            models.Deletion,
+        ):
+            db.execute(delete(model).where(model.groupeId.in_(groupe_ids)))
+        db.execute(delete(models.Menu).where(models.Menu.id.in_(seeded["menus"])))
+        db.execute(delete(models.Groupe).where(models.Groupe.id.in_(groupe_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- Stockage objet local ---------------------------------------------------
+
+class _StoredObject:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class LocalObjectStore:
+    """
+    Stand-in en mémoire du client MinIO (buckets, put_object, get_object) :
+    mesure l'upload de photos sans serveur S3. Ne sert qu'au banc in-process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = set()
+        self._objects: Dict[tuple, bytes] = {}
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return bucket_name in self._buckets
+
+    def make_bucket(self, bucket_name: str):
+        with self._lock:
+            self._buckets.add(bucket_name)
+
+    def put_object(self, bucket_name, object_name, data, length=-1, content_type=None, **kwargs):
+        payload = data.read() if length is None or length < 0 else data.read(length)
+        with self._lock:
+            self._objects[(bucket_name, object_name)] = payload
+
+    def get_object(self, bucket_name, object_name) -> _StoredObject:
+        with self._lock:
+            return _StoredObject(self._objects[(bucket_name, object_name)])
+
+    def __len__(self):
+        return len(self._objects)
+
+
+def install_local_object_store() -> LocalObjectStore:
+    store = LocalObjectStore()
+    storage._client = storage._meta_client = store
+    # Les renditions lisent l'objet en mémoire : pool de threads au lieu du pool de process
+    images._executor = ThreadPoolExecutor(max_workers=images.IMAGE_WORKERS)
+    return store
+
+
+def make_picture(size: int) -> bytes:
+    out = io.BytesIO()
+    Image.effect_noise((size, size * 3 // 4), 64).convert("RGB").save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+# --- Transport ASGI ---------------------------------------------------------
+
+class BenchASGITransport(httpx.AsyncBaseTransport):
+    """
+    Comme httpx.ASGITransport, mais la réponse est rendue dès son dernier octet :
+    les tâches de fond (renditions) ne comptent pas dans la latence, comme derrière uvicorn.
+    Le nombre de requêtes SQL émises (compté par app.sql_budget) est exposé dans
+    `response.extensions["sql_queries"]`.
+    """
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+        self.pending = set()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": request.url.scheme,
+            "path": request.url.path,
+            "raw_path": request.url.raw_path.split(b"?")[0],
+            "query_string": request.url.query,
+            "root_path": "",
+            "headers": [(key.lower(), value) for key, value in request.headers.raw],
+            "client": ("127.0.0.1", 0),
+            "server": (request.url.host, request.url.port or 80),
+        }
+        statements = []
+        response = {"status": 500, "headers": [], "body": bytearray(), "sql_queries": None}
+        complete = asyncio.Event()
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].extend(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response["sql_queries"] = len(statements)
+                    complete.set()
+
+        async def run():
+            # La tâche a sa propre copie du contexte : le suivi reste propre à la requête
+            nonlocal statements
+            with sql_budget.track_statements() as statements:
+                await self.app(scope, receive, send)
+
+        task = asyncio.create_task(run())
+        self.pending.add(task)
+        task.add_done_callback(self._finished)
+        waiter = asyncio.create_task(complete.wait())
+        await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        if not complete.is_set():
+            waiter.cancel()
+            task.result()
+            raise RuntimeError("L'application n'a pas terminé sa réponse")
+
+        return httpx.Response(
+            response["status"],
+            headers=response["headers"],
+            content=bytes(response["body"]),
+            extensions={"sql_queries": response["sql_queries"]},
+        )
+
+    def _finished(self, task: asyncio.Task):
+        self.pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.getLogger(__name__).error("Tâche ASGI en échec", exc_info=task.exception())
+
+    async def drain(self):
+        """Attend la fin des tâches de fond encore en cours (renditions)."""
+        while self.pending:
+            await asyncio.gather(*list(self.pending), return_exceptions=True)
+
+
+# --- Scénarios --------------------------------------------------------------
+
+async def _list_tentes(client, user, rng, picture):
+    return await client.get("/v2/tentes", headers=user["headers"])
+
+
+async def _list_controles(client, user, rng, picture):
+    return await client.get("/v2/controles", params={"limit": 50}, headers=user["headers"])
+
+
+async def _list_controles_large(client, user, rng, picture):
+    # Grande page : le coût de sérialisation domine celui de la requête
+    return await client.get("/v2/controles", params={"limit": 500}, headers=user["headers"])
+
+
+async def _sync_full(client, user, rng, picture):
+    return await client.get("/v2/sync", headers=user["headers"])
+
+
+async def _event_menus(client, user, rng, picture):
+    return await client.get(
+        "/v2/event_menus", params={"event_id": rng.choice(user["evenements"])}, headers=user["headers"]
+    )
+
+
+async def _create_controle(client, user, rng, picture):
+    return await client.post(
+        "/v2/controles",
+        json={
+            "tenteId": rng.choice(user["tentes"]),
+            "userId": 1,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "checklist": {"sardines": True, "toile": True},
+            "remarques": "benchmark",
+            "image_url": None,
+        },
+        headers=user["headers"],
+    )
+
+
+async def _upload_picture(client, user, rng, picture):
+    return await client.post(
+        f"/v2/controles/{rng.choice(user['controles'])}/picture",
+        files={"file": ("photo.jpg", picture, "image/jpeg")},
+        headers=user["headers"],
+    )
+
+
+SCENARIOS = {
+    "list_tentes": _list_tentes,
+    "list_controles": _list_controles,
+    "list_controles_large": _list_controles_large,
+    "sync_full": _sync_full,
+    "event_menus": _event_menus,
+    "create_controle": _create_controle,
+    "upload_picture": _upload_picture,
+}
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 3)
+
+
+def summarize(latencies: List[float], errors: int, sql_counts: List[int], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": round(latencies[-1] * 1000, 3) if latencies else None,
+        },
+        "sql_per_request": {
+            "mean": round(sum(sql_counts) / len(sql_counts), 2),
+            "max": max(sql_counts),
+        } if sql_counts else None,
+    }
+
+
+async def _run(client, users, call, requests: int, concurrency: int) -> dict:
+    latencies, sql_counts = [], []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(index: int):
+        nonlocal errors
+        user = users[index % len(users)]
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await call(client, user)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            if response.extensions.get("sql_queries") is not None:
+                sql_counts.append(response.extensions["sql_queries"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return summarize(latencies, errors, sql_counts, time.perf_counter() - start)
+
+
+async def login_all(client, users, concurrency: int) -> dict:
+    async def call(_client, user):
+        response = await _client.post("/v2/auth/login", json={"userlogin": user["userlogin"], "mdp": BENCH_PASSWORD})
+        response.raise_for_status()
+        user["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    # Une connexion par groupe, `concurrency` à la fois
+    return await _run(client, users, call, len(users), min(concurrency, len(users)))
+
+
+async def run_benchmark(args, seeded: dict) -> dict:
+    rng = random.Random(args.seed)
+    picture = make_picture(args.picture_size)
+    users = seeded["users"]
+    transport = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        transport = BenchASGITransport(app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+    results = {}
+    async with client:
+        # Chaque worker prend le groupe `index % groups` : on connecte tous les groupes d'abord
+        results["login"] = await login_all(client, users, args.concurrency)
+        for name in args.scenarios:
+            scenario = SCENARIOS[name]
+
+            async def call(_client, user, scenario=scenario):
+                return await scenario(_client, user, rng, picture)
+
+            # Échauffement : pool de connexions, caches, compilation des requêtes
+            await _run(client, users, call, min(args.warmup, args.requests), args.concurrency)
+            results[name] = await _run(client, users, call, args.requests, args.concurrency)
+            print(_format_line(name, results[name]), file=sys.stderr)
+    if transport is not None:
+        await transport.drain()
+    return results
+
+
+# --- Sortie -----------------------------------------------------------------
+
+def _format_line(name: str, result: dict) -> str:
+    latency = result["latency_ms"]
+    sql = result["sql_per_request"]
+    return (
+        f"{name:<16} {result['requests_per_s'] or 0:>9.1f} req/s  "
+        f"p50 {latency['p50'] or 0:>8.2f} ms  p95 {latency['p95'] or 0:>8.2f} ms  p99 {latency['p99'] or 0:>8.2f} ms  "
+        f"sql/req {sql['mean'] if sql else '-':>5}  errors {result['errors']}"
+    )
+
+
+def compare(previous: dict, current: dict) -> List[str]:
+    lines = []
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before or not before.get("requests_per_s") or not result.get("requests_per_s"):
+            continue
+        rps = (result["requests_per_s"] / before["requests_per_s"] - 1) * 100
+        p95_before, p95_after = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        lines.append(
+            f"{name:<16} req/s {before['requests_per_s']:.1f} -> {result['requests_per_s']:.1f} ({rps:+.1f} %)  "
+            f"p95 {p95_before:.2f} -> {p95_after:.2f} ms"
+        )
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de charge de l'API v2")
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--tents", type=int, default=100, help="tentes par groupe")
+    parser.add_argument("--controls", type=int, default=10, help="contrôles par tente")
+    parser.add_argument("--menus", type=int, default=100)
+    parser.add_argument("--events", type=int, default=5, help="événements par groupe")
+    parser.add_argument("--requests", type=int, default=500, help="requêtes par scénario")
+    parser.add_argument("--warmup", type=int, default=50, help="requêtes d'échauffement par scénario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--picture-size", type=int, default=1600, help="plus grand côté de la photo envoyée")
+    parser.add_argument("--url", help="uvicorn local à viser (sinon app ASGI dans le process)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="résultats JSON d'un banc précédent")
+    parser.add_argument("--keep", action="store_true", help="ne pas supprimer le jeu de données")
+    parser.add_argument("--verbose", action="store_true", help="garder les logs INFO et le journal d'accès")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.verbose:
+        # Une ligne de log par requête fausserait la mesure et noierait la sortie
+        logging.disable(logging.INFO)
+
+    prefix = f"bench-{int(time.time())}"
+    started_at = datetime.now(timezone.utc)
+    seeded = seed(prefix, args.groups, args.tents, args.controls, args.menus, args.events, random.Random(args.seed))
+    try:
+        if not args.url:
+            install_local_object_store()
+        scenarios = asyncio.run(run_benchmark(args, seeded))
+    finally:
+        images.shutdown()
+        if not args.keep:
+            cleanup(seeded)
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "target": args.url or "asgi",
+        "db_engine_mode": DB_ENGINE_MODE,
+        "dataset": {
+            "groups": args.groups,
+            "tents_per_group": args.tents,
+            "controls_per_tent": args.controls,
+            "menus": args.menus,
+            "events_per_group": args.events,
+        },
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "scenarios": scenarios,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(json.load(f), report):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import os
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app import schemas
+
+IMPORT_CHUNK_SIZE = int(os.getenv("CONTROLE_IMPORT_CHUNK_SIZE", 500))
+# Taille max du rapport d'erreurs renvoyé (les rejets suivants sont seulement comptés)
+IMPORT_MAX_ERRORS = int(os.getenv("CONTROLE_IMPORT_MAX_ERRORS", 100))
+
+FORMATS = ("csv", "ndjson")
+
+# Colonnes attendues dans un CSV ; `checklist` est une cellule JSON
+CSV_COLUMNS = ("tenteId", "userId", "date", "checklist", "remarques", "image_url")
+
+# Un enregistrement lu : (numéro de ligne, données, erreur)
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith(".csv") or content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def _iter_csv(text: io.TextIOBase) -> Iterator[Record]:
+    reader = csv.DictReader(text)
+    for row in reader:
+        line = reader.line_num
+        if None in row:
+            yield line, None, "Trop de colonnes"
+            continue
+        # Cellule vide -> None, comme un champ JSON null
+        record = {key: (value if value != "" else None) for key, value in row.items() if key in CSV_COLUMNS}
+        if record.get("checklist") is not None:
+            try:
+                record["checklist"] = json.loads(record["checklist"])
+            except ValueError:
+                yield line, None, "checklist : JSON invalide"
+                continue
+        yield line, record, None
+
+
+def _iter_ndjson(text: io.TextIOBase) -> Iterator[Record]:
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            yield line, None, "JSON invalide"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "Objet JSON attendu"
+            continue
+        yield line, record, None
+
+
+def iter_records(file: BinaryIO, fmt: str) -> Iterator[Record]:
+    """
+    Lit le fichier ligne à ligne (jamais en entier en mémoire).
+    Un fichier mal encodé arrête la lecture avec une dernière erreur.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    records = _iter_csv(text) if fmt == "csv" else _iter_ndjson(text)
+    line = 0
+    try:
+        for line, record, error in records:
+            yield line, record, error
+    except UnicodeDecodeError:
+        yield line + 1, None, "Encodage invalide (UTF-8 attendu), lecture interrompue"
+    except csv.Error as e:
+        yield line + 1, None, f"CSV invalide, lecture interrompue : {e}"
+    finally:
+        # Ne pas fermer le fichier de l'UploadFile avec le wrapper
+        text.detach()
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in item['loc'])} : {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def next_chunk(records: Iterator[Record], size: int = IMPORT_CHUNK_SIZE) -> Tuple[List[Tuple[int, schemas.ControleCreate]], List[Tuple[int, str]], bool]:
+    """
+    Lit et valide (ControleCreate) jusqu'à `size` lignes.
+    Renvoie (lignes valides, erreurs, fin du fichier atteinte).
+    Fonction bloquante : à appeler dans le threadpool.
+    """
+    valid, errors = [], []
+    for line, record, error in records:
+        if error is None:
+            try:
+                valid.append((line, schemas.ControleCreate(**record)))
+            except ValidationError as e:
+                error = _format_validation_error(e)
+        if error is not None:
+            errors.append((line, error))
+        if len(valid) + len(errors) >= size:
+            return valid, errors, False
+    return valid, errors, True
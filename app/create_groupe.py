@@ -1,6 +1,7 @@
 import argparse
 from app.database import SessionLocal
 from app.models import Groupe
+from app.security import hash_password
 
 def main():
     parser = argparse.ArgumentParser(description="Créer un groupe dans la base de données.")
@@ -14,7 +15,7 @@ def main():
     if db.query(Groupe).filter(Groupe.userlogin == args.userlogin).first():
         print(f"Groupe avec userlogin '{args.userlogin}' existe déjà.")
         return
-    groupe = Groupe(userlogin=args.userlogin, mdp=args.mdp, nom=args.nom, membres=args.membres)
+    groupe = Groupe(userlogin=args.userlogin, mdp=hash_password(args.mdp), nom=args.nom, membres=args.membres)
     db.add(groupe)
     db.commit()
     print(f"Groupe '{args.nom}' créé avec succès ! (userlogin: {args.userlogin})")
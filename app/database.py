@@ -1,10 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from anyio import to_thread
+import contextlib
+import functools
 import os
 
+from app import sql_budget
+from app.metrics import instrument_sql
+from app.pool_stats import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# "sync" : les routes v2 utilisent le moteur psycopg2, chaque appel BDD passant par un thread
+# "async" : les routes v2 utilisent un moteur asyncio natif (asyncpg) via AsyncSession
+DB_ENGINE_MODE = os.getenv("DB_ENGINE_MODE", "sync").lower()
+if DB_ENGINE_MODE not in ("sync", "async"):
+    raise ValueError("DB_ENGINE_MODE must be 'sync' or 'async'")
+
+# Réglages du pool, appliqués au moteur sync comme au moteur async
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    # Recycle les connexions avant qu'un proxy / pare-feu ne les coupe (-1 pour désactiver)
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+}
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_SETTINGS)
+pool_stats = {"sync": instrument_engine(engine)}
+instrument_sql(engine)
+sql_budget.instrument_sql(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -14,4 +41,110 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def _to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ENGINE_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **POOL_SETTINGS)
+    pool_stats["async"] = instrument_engine(async_engine.sync_engine)
+    instrument_sql(async_engine.sync_engine)
+    sql_budget.instrument_sql(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def get_pool_stats() -> dict:
+    engines = {"sync": engine}
+    if async_engine is not None:
+        engines["async"] = async_engine.sync_engine
+    return {
+        name: {**POOL_SETTINGS, **pool_stats[name].snapshot(bound.pool)}
+        for name, bound in engines.items()
+    }
+
+
+class ThreadedSession:
+    """
+    Même interface (awaitable) qu'AsyncSession, au-dessus d'une Session synchrone :
+    chaque opération BDD s'exécute dans le threadpool, pas sur la boucle asyncio.
+    Permet aux routes async de tourner à l'identique avec DB_ENGINE_MODE=sync.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def _run(self, fn, *args, **kwargs):
+        return await to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        # Comme AsyncSession : les lignes sont chargées dans le thread, pas sur la boucle
+        execution_options = {"prebuffer_rows": True, **kwargs.pop("execution_options", {})}
+        return await self._run(
+            self.sync_session.execute, statement, params, execution_options=execution_options, **kwargs
+        )
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        await self._run(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        await self._run(self.sync_session.close)
+
+
+async def get_async_db():
+    """
+    Session pour les routes v2 (async def), selon DB_ENGINE_MODE.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    # expire_on_commit=False : comme AsyncSession, pas de rechargement implicite après commit
+    db = ThreadedSession(SessionLocal(expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# Pour les traitements hors requête (tâches de fond)
+async_session = contextlib.asynccontextmanager(get_async_db)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from app import models
+
+# Collections versionnées par groupe
+TENTES = "tentes"
+EVENEMENTS = "evenements"
+CONTROLES = "controles"
+EVENT_MENUS = "event_menus"
+# Catalogue de menus partagé entre les groupes : versionné sous ce groupeId
+MENUS = "menus"
+SHARED_GROUPE_ID = 0
+
+# À changer quand le format des réponses évolue, pour invalider les ETag déjà distribués
+ETAG_SALT = os.getenv("ETAG_SALT", "1")
+
+
+async def bump_version(db, groupe_id: int, *collections: str):
+    """
+    Incrémente la version des collections dans la transaction de l'écriture :
+    la nouvelle version devient visible au commit, en même temps que les données.
+    """
+    for collection in collections:
+        stmt = insert(models.CollectionVersion).values(groupeId=groupe_id, collection=collection, version=1)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[models.CollectionVersion.groupeId, models.CollectionVersion.collection],
+                set_={"version": models.CollectionVersion.version + 1},
+            )
+        )
+
+
+async def get_versions(db, groupe_id: int, collections: Sequence[str]) -> Dict[str, int]:
+    rows = await db.execute(
+        select(models.CollectionVersion.collection, models.CollectionVersion.version).filter(
+            models.CollectionVersion.groupeId == groupe_id,
+            models.CollectionVersion.collection.in_(collections),
+        )
+    )
+    versions = dict(rows.all())
+    return {collection: versions.get(collection, 0) for collection in collections}
+
+
+async def get_version_pairs(db, keys: Sequence[Tuple[int, str]]) -> Tuple[int, ...]:
+    """Versions de plusieurs (groupeId, collection) en une requête, dans l'ordre de `keys`."""
+    rows = await db.execute(
+        select(models.CollectionVersion.groupeId, models.CollectionVersion.collection, models.CollectionVersion.version)
+        .filter(tuple_(models.CollectionVersion.groupeId, models.CollectionVersion.collection).in_(keys))
+    )
+    versions = {(groupe_id, collection): version for groupe_id, collection, version in rows}
+    return tuple(versions.get(key, 0) for key in keys)
+
+
+def make_etag(request: Request, groupe_id: int, collection: str, version) -> str:
+    # Le chemin et les paramètres (filtres, limit, cursor) font partie de la clé
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    raw = f"{ETAG_SALT}:{groupe_id}:{collection}:{version}:{request.url.path}?{query}"
+    return f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible (RFC 9110) : le préfixe W/ est ignoré
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+async def check_not_modified(
+    request: Request,
+    response: Response,
+    db,
+    groupe_id: int,
+    *collections: str,
+) -> Optional[Response]:
+    """
+    À appeler avant la requête principale d'un GET.
+    Renvoie une réponse 304 si le client a déjà la version courante (If-None-Match),
+    sinon pose l'en-tête ETag sur `response` et renvoie None.
+    Une réponse qui agrège plusieurs collections dépend de la version de chacune.
+    """
+    versions = await get_versions(db, groupe_id, collections)
+    etag = make_etag(
+        request,
+        groupe_id,
+        "+".join(collections),
+        ".".join(str(versions[collection]) for collection in collections),
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,112 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# "0" : les listes repassent par response_model (validation Pydantic + jsonable_encoder), pour comparer
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+
+# Comme Pydantic : datetimes UTC en "Z", naïfs sans décalage, dates ISO
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+_MISSING = object()
+
+# schéma -> ((champ, FieldInfo, (sous-schéma, liste ?) ou None), ...)
+_plans: Dict[Type[BaseModel], tuple] = {}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse sérialisée par orjson : même JSON compact et UTF-8 que la réponse par défaut."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def _nested_model(annotation) -> Optional[Tuple[Type[BaseModel], bool]]:
+    """Sous-schéma d'un champ (X, Optional[X] ou List[X]) et s'il s'agit d'une liste."""
+    origin = get_origin(annotation)
+    if origin is None:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return annotation, False
+        return None
+    if origin is list:
+        nested = _nested_model(get_args(annotation)[0])
+        return (nested[0], True) if nested and not nested[1] else None
+    if origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _nested_model(args[0]) if len(args) == 1 else None
+    return None
+
+
+def _plan(schema: Type[BaseModel]) -> tuple:
+    plan = _plans.get(schema)
+    if plan is None:
+        plan = _plans[schema] = tuple(
+            (name, field, _nested_model(field.annotation)) for name, field in schema.model_fields.items()
+        )
+    return plan
+
+
+def to_dict(schema: Type[BaseModel], obj: Any, exclude_unset: bool = False) -> dict:
+    """
+    Lit les champs de `schema` directement sur une ligne ORM (ou un dict), sans validation :
+    mêmes clés, dans le même ordre, que `schema.model_validate(obj).model_dump()`.
+    Les valeurs viennent de la base et ont déjà les types du schéma.
+    Avec `exclude_unset`, un attribut absent de l'objet est omis (response_model_exclude_unset).
+    """
+    is_dict = isinstance(obj, dict)
+    data = {}
+    for name, field, nested in _plan(schema):
+        value = obj.get(name, _MISSING) if is_dict else getattr(obj, name, _MISSING)
+        if value is _MISSING:
+            if exclude_unset:
+                continue
+            if field.is_required():
+                raise ValueError(f"{schema.__name__}.{name} absent de {type(obj).__name__}")
+            value = field.get_default(call_default_factory=True)
+        elif nested is not None and value is not None:
+            model, many = nested
+            if many:
+                value = [to_dict(model, item, exclude_unset) for item in value]
+            else:
+                value = to_dict(model, value, exclude_unset)
+        data[name] = value
+    return data
+
+
+def dump_list(schema: Type[BaseModel], rows: Iterable[Any], exclude_unset: bool = False) -> bytes:
+    """Lignes ORM -> corps JSON d'une réponse `List[schema]`."""
+    return orjson.dumps([to_dict(schema, row, exclude_unset) for row in rows], option=ORJSON_OPTIONS)
+
+
+def _response(content: Any, response: Optional[Response]) -> FastJSONResponse:
+    fast = FastJSONResponse(content)
+    if response is not None:
+        # Une Response renvoyée telle quelle ne reprend pas les en-têtes posés sur `response` (ETag, X-Next-Cursor)
+        fast.headers.raw.extend(response.headers.raw)
+    return fast
+
+
+def list_response(
+    schema: Type[BaseModel],
+    rows: List[Any],
+    response: Optional[Response] = None,
+    exclude_unset: bool = False,
+):
+    """
+    Réponse d'une route `response_model=List[schema]` sérialisée directement depuis les lignes ORM.
+    La route garde son response_model (documentation OpenAPI, repli quand FAST_JSON=0).
+    """
+    if not FAST_JSON:
+        return rows
+    return _response([to_dict(schema, row, exclude_unset) for row in rows], response)
+
+
+def model_response(schema: Type[BaseModel], obj: Any, response: Optional[Response] = None):
+    """Idem pour une route `response_model=schema` (objet ORM ou dict de lignes ORM)."""
+    if not FAST_JSON:
+        return obj
+    return _response(to_dict(schema, obj), response)
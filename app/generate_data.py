@@ -0,0 +1,317 @@
+"""
+Génère un jeu de données synthétique à l'échelle de la production (capacité, bancs de charge).
+
+    python -m app.generate_data --groups 2000 --tents 40 --years 3 --seed 42
+
+Groupes (mots de passe hachés, unités), tentes, historique de contrôles sur plusieurs années
+avec checklist, événements avec tentesAssociees, menus et planning des repas.
+Chargement par COPY, en lots : la mémoire reste bornée quel que soit le volume.
+Même graine + mêmes options = mêmes données. Les tables doivent exister (python -m app.init_db).
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from app.database import engine
+from app.security import hash_password
+
+COPY_BATCH_ROWS = 50000
+# Année fixe (et non relative à aujourd'hui) : même graine = mêmes dates, quelle que soit l'année du lancement
+DEFAULT_START_YEAR = 2022
+
+UNIT_NAMES = ["Farfadets", "Louveteaux", "Jeannettes", "Scouts", "Guides", "Pionniers", "Caravelles", "Compagnons"]
+GROUPE_TYPES = ["scouts", "guides", "éclaireurs"]
+ETATS = (("ok", 70), ("abîmée", 20), ("à réparer", 8), ("hors service", 2))
+TYPES_TENTE = ["dôme", "tunnel", "canadienne", "marabout", "patrouille"]
+COULEURS = ["vert", "bleu", "rouge", "jaune", "beige", "orange"]
+CHECKLIST_ITEMS = ["toile", "double toit", "arceaux", "sardines", "tendeurs", "fermetures", "tapis de sol"]
+REMARQUES = ["RAS", "Sardines manquantes", "Accroc sur la toile", "Fermeture éclair dure", "Arceau fendu", "Moisissure légère"]
+TYPES_EVENEMENT = ["camp", "week-end", "sortie", "rassemblement"]
+PLATS = ["pâtes bolognaise", "riz cantonais", "chili con carne", "curry de lentilles", "gratin dauphinois",
+         "soupe de légumes", "salade composée", "hachis parmentier", "couscous", "omelette"]
+CATEGORIES = ["plat", "entrée", "dessert", "petit-déjeuner"]
+TAGS = ["végétarien", "rapide", "feu de camp", "sans cuisson", "économique"]
+ALLERGENES = ["gluten", "lait", "œufs", "arachides", "céleri", "moutarde"]
+INGREDIENTS = (("pâtes", "g"), ("riz", "g"), ("tomates", "g"), ("oignons", "pièce"), ("lait", "mL"),
+               ("œufs", "pièce"), ("lentilles", "g"), ("pommes de terre", "kg"), ("fromage", "g"), ("huile", "cL"))
+
+# Tables remplies, dans l'ordre des clés étrangères
+TABLES = ("groupes", "menus", "tentes", "controles", "evenements", "event_menus")
+
+
+def _array(values: Iterable) -> str:
+    """Littéral tableau PostgreSQL (valeurs générées : pas de guillemet ni d'antislash)."""
+    return "{" + ",".join(f'"{value}"' for value in values) + "}"
+
+
+def _weighted(rng: random.Random, choices: Sequence[Tuple[str, int]]) -> str:
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterator[tuple]) -> int:
+    """COPY ... FROM STDIN par lots de COPY_BATCH_ROWS lignes CSV (None -> NULL)."""
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    statement = f"COPY {table} ({quoted}) FROM STDIN WITH (FORMAT csv)"
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % COPY_BATCH_ROWS == 0:
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+    if buffer.tell():
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+    return count
+
+
+class Plan:
+    """
+    Structure du jeu de données (nombre de tentes, unités et événements par groupe),
+    tirée en premier pour que chaque table puisse être générée indépendamment.
+    Les ids sont réservés à la suite des ids existants.
+    """
+
+    def __init__(self, args, first_ids: dict):
+        rng = random.Random(f"{args.seed}-plan")
+        self.args = args
+        self.start = datetime(args.start_year, 1, 1)
+        self.first_ids = first_ids
+        self.tentes_par_groupe = [
+            max(1, round(args.tents * rng.uniform(0.5, 1.5))) for _ in range(args.groups)
+        ]
+        self.unites_par_groupe = [rng.randint(2, 5) for _ in range(args.groups)]
+        self.evenements_par_groupe = args.events * args.years
+
+    def groupe_id(self, g: int) -> int:
+        return self.first_ids["groupes"] + g
+
+    def menu_ids(self) -> range:
+        return range(self.first_ids["menus"], self.first_ids["menus"] + self.args.menus)
+
+    def tentes(self) -> Iterator[Tuple[int, int, range]]:
+        """(index du groupe, id du groupe, ids de ses tentes)"""
+        next_id = self.first_ids["tentes"]
+        for g, count in enumerate(self.tentes_par_groupe):
+            yield g, self.groupe_id(g), range(next_id, next_id + count)
+            next_id += count
+
+
+def generate_groupes(plan: Plan, mdp_hash: str) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.args.seed}-groupes")
+    for g in range(plan.args.groups):
+        units = [
+            {"id": f"u{u + 1}", "name": name}
+            for u, name in enumerate(rng.sample(UNIT_NAMES, plan.unites_par_groupe[g]))
+        ]
+        membres = [f"Membre {m + 1}" for m in range(rng.randint(3, 15))]
+        yield (
+            plan.groupe_id(g),
+            f"{plan.args.prefix}-{g + 1}",
+            mdp_hash,
+            f"Groupe {plan.args.prefix} {g + 1}",
+            f"{plan.args.prefix}-{g + 1}@example.org",
+            _array(membres),
+            ", ".join(membres),
+            rng.choice(GROUPE_TYPES),
+            json.dumps(units, ensure_ascii=False),
+        )
+
+
+def generate_menus(plan: Plan) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.args.seed}-menus")
+    for menu_id in plan.menu_ids():
+        plat = rng.choice(PLATS)
+        ingredients = [
+            {"nom": nom, "quantite": str(rng.choice([1, 2, 50, 100, 150, 250, 500])), "unite": unite}
+            for nom, unite in rng.sample(INGREDIENTS, rng.randint(3, 6))
+        ]
+        yield (
+            menu_id,
+            f"{plat.capitalize()} n°{menu_id}",
+            f"Recette de {plat} pour un groupe",
+            f"Préparer les ingrédients puis cuire le {plat} à feu moyen en remuant.",
+            rng.choice(CATEGORIES),
+            json.dumps(ingredients, ensure_ascii=False),
+            _array(rng.sample(ALLERGENES, rng.randint(0, 2))),
+            _array(rng.sample(TAGS, rng.randint(1, 3))),
+        )
+
+
+def generate_tentes(plan: Plan) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.args.seed}-tentes")
+    for g, groupe_id, tente_ids in plan.tentes():
+        unites = UNIT_NAMES[:plan.unites_par_groupe[g]]
+        for n, tente_id in enumerate(tente_ids):
+            yield (
+                tente_id,
+                f"Tente {n + 1}",
+                _weighted(rng, ETATS),
+                rng.choice(REMARQUES) if rng.random() < 0.3 else None,
+                rng.choice([2, 3, 4, 6, 8]),
+                rng.choice(TYPES_TENTE),
+                rng.choice(unites),
+                _array(rng.sample(COULEURS, rng.randint(1, 2))),
+                groupe_id,
+                rng.random() < 0.1,
+                f"Équipe {rng.randint(1, 6)}" if rng.random() < 0.5 else None,
+                f"Local {rng.choice('ABC')}",
+            )
+
+
+def generate_controles(plan: Plan) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.args.seed}-controles")
+    args = plan.args
+    days = 365 * args.years
+    per_tent = args.controls_per_year * args.years
+    controle_id = plan.first_ids["controles"]
+    for _, groupe_id, tente_ids in plan.tentes():
+        for tente_id in tente_ids:
+            # Contrôles répartis sur la période, dans l'ordre chronologique
+            for offset in sorted(rng.randrange(days) for _ in range(per_tent)):
+                checklist = {item: rng.random() > 0.08 for item in CHECKLIST_ITEMS}
+                yield (
+                    controle_id,
+                    tente_id,
+                    rng.randint(1, 50),
+                    (plan.start + timedelta(days=offset, minutes=rng.randrange(8 * 60, 20 * 60))).isoformat(),
+                    json.dumps(checklist, ensure_ascii=False),
+                    "RAS" if all(checklist.values()) else rng.choice(REMARQUES[1:]),
+                    groupe_id,
+                )
+                controle_id += 1
+
+
+def _evenements(plan: Plan) -> Iterator[Tuple[int, int, int, range, datetime, int]]:
+    """(id, id du groupe, index du groupe, tentes du groupe, début, nombre de jours)"""
+    rng = random.Random(f"{plan.args.seed}-evenements")
+    evenement_id = plan.first_ids["evenements"]
+    days = 365 * plan.args.years
+    for g, groupe_id, tente_ids in plan.tentes():
+        for _ in range(plan.evenements_par_groupe):
+            debut = plan.start + timedelta(days=rng.randrange(days), hours=rng.choice([9, 14, 18]))
+            yield evenement_id, groupe_id, g, tente_ids, debut, rng.choice([1, 2, 2, 3, 7, 14])
+            evenement_id += 1
+
+
+def generate_evenements(plan: Plan) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.args.seed}-tentes-associees")
+    for evenement_id, groupe_id, g, tente_ids, debut, jours in _evenements(plan):
+        associees = rng.sample(tente_ids, min(len(tente_ids), rng.randint(2, 12)))
+        unites = rng.sample(range(1, plan.unites_par_groupe[g] + 1), rng.randint(1, plan.unites_par_groupe[g]))
+        yield (
+            evenement_id,
+            f"{rng.choice(TYPES_EVENEMENT).capitalize()} {debut:%m/%Y}",
+            debut.isoformat(),
+            (debut + timedelta(days=jours)).isoformat(),
+            rng.choice(TYPES_EVENEMENT),
+            _array(sorted(associees)),
+            _array(sorted(unites)),
+            groupe_id,
+        )
+
+
+def generate_event_menus(plan: Plan) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.args.seed}-event-menus")
+    menu_ids = plan.menu_ids()
+    for evenement_id, groupe_id, _, _, _, jours in _evenements(plan):
+        personnes = rng.randint(8, 40)
+        for day in range(1, jours + 2):
+            for repas in ("petit-déjeuner", "midi", "soir"):
+                yield evenement_id, rng.choice(menu_ids), day, repas, personnes, groupe_id
+
+
+def _reserve_ids(cursor) -> dict:
+    first_ids = {}
+    for table in TABLES:
+        cursor.execute(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+        first_ids[table] = cursor.fetchone()[0]
+    return first_ids
+
+
+def generate(args) -> List[Tuple[str, int, float]]:
+    raw = engine.raw_connection()
+    stats = []
+    try:
+        cursor = raw.cursor()
+        # Ids explicites, réservés à la suite des existants : personne d'autre n'écrit pendant le chargement
+        cursor.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+        plan = Plan(args, _reserve_ids(cursor))
+        # Même mot de passe pour tous les groupes : un seul hash argon2 (volontairement lent)
+        mdp_hash = hash_password(args.password)
+
+        steps = (
+            ("groupes", ("id", "userlogin", "mdp", "nom", "email", "membres", "members", "type", "units"),
+             generate_groupes(plan, mdp_hash)),
+            ("menus", ("id", "title", "description", "instructions", "category", "ingredients", "allergens", "tags"),
+             generate_menus(plan)),
+            ("tentes", ("id", "nom", "etat", "remarques", "nbPlaces", "typeTente", "unitePreferee", "couleurs",
+                        "groupeId", "estIntegree", "equipe", "localisation"),
+             generate_tentes(plan)),
+            ("controles", ("id", "tenteId", "userId", "date", "checklist", "remarques", "groupeId"),
+             generate_controles(plan)),
+            ("evenements", ("id", "nom", "date", "dateFin", "type", "tentesAssociees", "unites", "groupeId"),
+             generate_evenements(plan)),
+            ("event_menus", ("event_id", "menu_id", "day_number", "type_repas", "quantite_personnes", "groupeId"),
+             generate_event_menus(plan)),
+        )
+        for table, columns, rows in steps:
+            start = time.perf_counter()
+            count = copy_rows(cursor, table, columns, rows)
+            stats.append((table, count, time.perf_counter() - start))
+            print(f"{table:<12} {count:>10} lignes  {stats[-1][2]:7.1f} s")
+
+        for table in TABLES:
+            # Les séquences reprennent après les ids insérés explicitement
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+            )
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    if not args.no_analyze:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(f"ANALYZE {', '.join(TABLES)}")
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Générer un jeu de données synthétique réaliste.")
+    parser.add_argument("--groups", type=int, default=1000, help="nombre de groupes")
+    parser.add_argument("--tents", type=int, default=40, help="tentes par groupe (moyenne, ±50 %%)")
+    parser.add_argument("--years", type=int, default=3, help="années d'historique")
+    parser.add_argument("--start-year", type=int, default=DEFAULT_START_YEAR, help="début de l'historique")
+    parser.add_argument("--controls-per-year", type=int, default=4, help="contrôles par tente et par an")
+    parser.add_argument("--events", type=int, default=6, help="événements par groupe et par an")
+    parser.add_argument("--menus", type=int, default=500, help="menus partagés")
+    parser.add_argument("--prefix", default="synth", help="préfixe des userlogin (synth-1, synth-2, ...)")
+    parser.add_argument("--password", default="synth", help="mot de passe commun des groupes générés")
+    parser.add_argument("--seed", type=int, default=42, help="graine : même graine, mêmes données")
+    parser.add_argument("--no-analyze", action="store_true", help="ne pas lancer ANALYZE après le chargement")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    stats = generate(args)
+    total = sum(count for _, count, _ in stats)
+    elapsed = time.perf_counter() - start
+    print(f"Total : {total} lignes en {elapsed:.1f} s ({total / elapsed:.0f} lignes/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+from app import storage
+
+# Renditions produites pour chaque photo : nom -> plus grand côté en pixels
+RENDITIONS = {
+    "thumbnail": int(os.environ.get("IMAGE_THUMBNAIL_SIZE", 256)),
+    "medium": int(os.environ.get("IMAGE_MEDIUM_SIZE", 1280)),
+}
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 82))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def rendition_object_name(object_name: str, rendition: str) -> str:
+    """Rangée à côté de l'original, sous le même préfixe {groupe_id}/{controle_id}/."""
+    base = object_name.rsplit(".", 1)[0]
+    return f"{base}_{rendition}.jpg"
+
+
+def make_rendition(data: bytes, max_size: int) -> bytes:
+    """
+    Redimensionne en JPEG (côté max `max_size`), orientation EXIF appliquée
+    puis métadonnées supprimées (pas de position GPS dans les miniatures).
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        # Décodage JPEG directement à une échelle réduite : bien moins de CPU et de mémoire
+        img.draft("RGB", (max_size, max_size))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def process_picture(bucket_name: str, object_name: str) -> Dict[str, str]:
+    """
+    Exécuté dans un process du pool : lit l'original, produit et dépose les renditions.
+    Renvoie {rendition: object_name}.
+    """
+    data = storage.download_bytes(bucket_name, object_name)
+
+    results = {}
+    for rendition, max_size in RENDITIONS.items():
+        name = rendition_object_name(object_name, rendition)
+        storage.upload_bytes(bucket_name, name, make_rendition(data, max_size), content_type="image/jpeg")
+        results[rendition] = name
+    return results
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # "spawn" : les workers ne héritent ni des connexions BDD ni de la boucle asyncio
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def generate_renditions(bucket_name: str, object_name: str) -> Dict[str, str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), process_picture, bucket_name, object_name)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
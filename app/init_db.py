@@ -1,10 +1,87 @@
+from sqlalchemy import CheckConstraint, inspect, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import AddConstraint
+
 from app.database import engine
 from app.models import Base
 
+def create_missing_columns():
+    # create_all n'ajoute pas les colonnes ajoutées après coup à une table existante :
+    # colonnes nullables, ou NOT NULL avec une valeur par défaut côté serveur (ex. updated_at)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                if column.nullable:
+                    ddl = column_type
+                elif column.server_default is not None:
+                    default = engine.dialect.ddl_compiler(engine.dialect, None).get_column_default_string(column)
+                    ddl = f"{column_type} NOT NULL DEFAULT {default}"
+                else:
+                    continue
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS "{column.name}" {ddl}'
+                ))
+
+def create_missing_indexes():
+    # create_all ne crée pas les index ajoutés après coup sur une table existante
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except DBAPIError as e:
+                # Données existantes incompatibles avec l'expression indexée : à corriger à la main
+                print(f"Index {index.name} not created: {e.orig}")
+
+def create_missing_constraints():
+    # create_all n'ajoute pas les contraintes CHECK / EXCLUDE ajoutées après coup
+    for table in Base.metadata.sorted_tables:
+        for constraint in table.constraints:
+            if not isinstance(constraint, (CheckConstraint, ExcludeConstraint)) or constraint.name is None:
+                continue
+            with engine.connect() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = to_regclass(:table)"),
+                    {"name": constraint.name, "table": table.name},
+                ).first()
+                if exists:
+                    continue
+                try:
+                    conn.execute(AddConstraint(constraint))
+                    conn.commit()
+                except DBAPIError as e:
+                    # Données existantes incompatibles (ex. réservations qui se chevauchent) : à corriger à la main
+                    conn.rollback()
+                    print(f"Constraint {constraint.name} not created: {e.orig}")
+
+def backfill_groupe_ids():
+    # groupeId dénormalisé sur les contrôles, réservations (depuis la tente) et repas (depuis l'événement)
+    with engine.begin() as conn:
+        for table, source, key in (
+            ("controles", "tentes", "tenteId"),
+            ("reservations", "tentes", "tenteId"),
+            ("event_menus", "evenements", "event_id"),
+        ):
+            conn.execute(text(
+                f'UPDATE {table} SET "groupeId" = {source}."groupeId" FROM {source} '
+                f'WHERE {table}."groupeId" IS NULL AND {source}.id = {table}."{key}"'
+            ))
+
 def init_db():
     print("Creating all tables...")
     Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    create_missing_indexes()
+    create_missing_constraints()
+    backfill_groupe_ids()
     print("Done.")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -2,14 +2,24 @@ from .routes.v1 import menus
 from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from . import models, schemas, database
+from . import models, schemas, database, images
 from .routes.v1 import tentes, evenements, reservations, controles, auth
-from .routes.v2 import auth_v2, tents_v2, events_v2, controls_v2, menus_v2, group
+from .routes.v2 import auth_v2, tents_v2, events_v2, controls_v2, menus_v2, group, sync_v2, reservations_v2
+from .routes import internal
+from .access_log import AccessLogMiddleware
+from .metrics import MetricsMiddleware
+from .sql_budget import SQLBudgetMiddleware
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
+
+
+@app.on_event("shutdown")
+def stop_image_workers():
+    images.shutdown()
+
 V1_PREFIXES = (
     "/tentes",
     "/evenements",
@@ -40,22 +50,12 @@ async def block_v1_routes(request: Request, call_next):
 
     return await call_next(request)
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logging.info("🟢 Middleware actif : interception d'une requête")
-    logging.info(f"➡️ {request.method} {request.url}")
-    logging.info(f"Headers: {request.headers}")
-    if request.method == "POST" or request.method == "PUT":
-        body = await request.body()
-        body_str = body.decode('utf-8')
-        if "mdp" not in body_str:
-            logging.info(f"Body: {body.decode('utf-8')}")
-       
-    else:
-        logging.info("Pas de corps pour cette requête")
-    response = await call_next(request)
-    logging.info(f"⬅️ Réponse status: {response.status_code}")
-    return response
+# Journal d'accès structuré (une ligne JSON par requête, échantillonnable)
+app.add_middleware(AccessLogMiddleware)
+# Budget SQL / détection N+1 (SQL_BUDGET_MODE=warn|raise, en dev et en test)
+app.add_middleware(SQLBudgetMiddleware)
+# Métriques Prometheus (/metrics), en dernier : c'est le middleware le plus externe
+app.add_middleware(MetricsMiddleware)
 
 # Include routers for all endpoints
 app.include_router(auth_v2.router, prefix="/v2")
@@ -63,4 +63,8 @@ app.include_router(tents_v2.router, prefix="/v2")
 app.include_router(events_v2.router, prefix="/v2")
 app.include_router(controls_v2.router, prefix="/v2")
 app.include_router(menus_v2.router, prefix="/v2")
-app.include_router(group.router, prefix="/v2")
\ No newline at end of file
+app.include_router(group.router, prefix="/v2")
+app.include_router(sync_v2.router, prefix="/v2")
+app.include_router(reservations_v2.router, prefix="/v2")
+app.include_router(internal.router)
+app.include_router(internal.metrics_router)
\ No newline at end of file
@@ -0,0 +1,195 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Bornes des histogrammes (secondes, ou nombre de requêtes SQL)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+STORAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# nom -> (type, aide, bornes)
+METRICS = {
+    "http_requests_total": ("counter", "Requêtes HTTP traitées", None),
+    "http_request_duration_seconds": ("histogram", "Durée des requêtes HTTP", LATENCY_BUCKETS),
+    "http_requests_in_progress": ("gauge", "Requêtes HTTP en cours", None),
+    "http_request_db_statements": ("histogram", "Requêtes SQL par requête HTTP", SQL_COUNT_BUCKETS),
+    "http_request_db_duration_seconds": ("histogram", "Temps SQL cumulé par requête HTTP", LATENCY_BUCKETS),
+    "db_statement_duration_seconds": ("histogram", "Durée des requêtes SQL", SQL_DURATION_BUCKETS),
+    "storage_operation_duration_seconds": ("histogram", "Durée des opérations de stockage objet", STORAGE_BUCKETS),
+    "storage_operation_errors_total": ("counter", "Opérations de stockage objet en échec", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # [compte par borne..., compte au-delà, somme]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+class Registry:
+    """
+    Compteurs et histogrammes au format texte Prometheus.
+    Chaque thread écrit dans son propre shard, sans verrou : seul l'ajout d'un shard
+    et la lecture (rare, au scrape) les parcourent tous.
+    """
+
+    def __init__(self, metrics: dict = METRICS):
+        self.metrics = metrics
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float):
+        buckets = self.metrics[name][2]
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+    def collect(self) -> Tuple[dict, dict]:
+        with self._lock:
+            shards = list(self._shards)
+        counters, histograms = {}, {}
+        for shard in shards:
+            # copy() est atomique sous le GIL : le thread propriétaire peut continuer à écrire
+            for key, value in shard.counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, values in shard.histograms.copy().items():
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(list(values)):
+                    total[i] += value
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in self.metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), values in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), values):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+            else:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+registry = Registry()
+
+# [requêtes SQL, secondes] de la requête HTTP en cours : propagé aux threads et aux greenlets
+_request_db: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("metrics_request_db", default=None)
+
+
+def observe_storage(operation: str, seconds: float, error: bool):
+    labels = (("operation", operation),)
+    registry.observe("storage_operation_duration_seconds", labels, seconds)
+    if error:
+        registry.inc("storage_operation_errors_total", labels)
+
+
+def instrument_sql(engine):
+    """Branche le chronométrage SQL sur `engine` (moteur sync ou `async_engine.sync_engine`)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        registry.observe("db_statement_duration_seconds", (), elapsed)
+        current = _request_db.get()
+        if current is not None:
+            current[0] += 1
+            current[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        starts = exception_context.connection.info.get("metrics_query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI pur : durée et statut par gabarit de route (jamais le chemin brut,
+    pour borner le nombre de séries), requêtes en cours et temps SQL de chaque requête.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        registry.inc("http_requests_in_progress")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db.reset(token)
+            registry.inc("http_requests_in_progress", value=-1)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            labels = (("method", scope["method"]), ("route", route), ("status", str(status["code"])))
+            registry.inc("http_requests_total", labels)
+            registry.observe("http_request_duration_seconds", labels, time.perf_counter() - start)
+            route_labels = (("route", route),)
+            registry.observe("http_request_db_statements", route_labels, db[0])
+            registry.observe("http_request_db_duration_seconds", route_labels, db[1])
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Text, JSON, Boolean, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import BigInteger, CheckConstraint, Column, Integer, String, Date, DateTime, Text, JSON, Boolean, ForeignKey, Index, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, ExcludeConstraint
 from .database import Base
 
 class Tente(Base):
@@ -16,6 +16,26 @@ class Tente(Base):
     estIntegree = Column(Boolean, default=False)  # 0 = False, 1 = True
     equipe = Column(String)
     localisation = Column(String)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Synchronisation delta (/v2/sync) : modifications d'un groupe depuis un instant
+        Index("ix_tentes_groupe_updated_at", "groupeId", "updated_at"),
+    )
+
+def keyset_date(column):
+    """
+    Date nullable d'une clé de pagination keyset : NULL triée comme -infinity,
+    car une comparaison de ligne avec NULL n'est jamais vraie. Même expression dans les index.
+    """
+    return func.coalesce(column, text("'-infinity'::timestamp"))
+
+def evenement_periode(date, date_fin):
+    """
+    Période d'un événement, bornes incluses, pour l'index GiST et /v2/tentes/available.
+    LEAST / GREATEST : un événement saisi avec dateFin < date reste accepté (période remise dans l'ordre).
+    """
+    return func.tsrange(func.least(date, date_fin), func.greatest(date, date_fin), text("'[]'"))
 
 class Evenement(Base):
     __tablename__ = "evenements"
@@ -27,6 +47,20 @@ class Evenement(Base):
     tentesAssociees = Column(ARRAY(Integer))
     unites = Column(ARRAY(Integer))
     groupeId = Column(Integer, ForeignKey("groupes.id"), index=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Pagination keyset de /v2/evenements : (groupeId, date, id), date NULL en premier
+        Index("ix_evenements_groupe_date_id", "groupeId", keyset_date(date), "id"),
+        Index("ix_evenements_groupe_updated_at", "groupeId", "updated_at"),
+        # Disponibilité des tentes (/v2/tentes/available) : tentes associées et période
+        Index("ix_evenements_tentes_associees", "tentesAssociees", postgresql_using="gin"),
+        Index(
+            "ix_evenements_periode",
+            evenement_periode(date, dateFin),
+            postgresql_using="gist",
+        ),
+    )
 
 class Reservation(Base):
     __tablename__ = "reservations"
@@ -35,6 +69,20 @@ class Reservation(Base):
     evenementId = Column(Integer)
     debut = Column(Date)
     fin = Column(Date)
+    groupeId = Column(Integer, ForeignKey("groupes.id"), index=True)  # dénormalisé depuis la tente
+
+    __table_args__ = (
+        CheckConstraint("fin >= debut", name="ck_reservations_periode"),
+        # Pas de double réservation d'une tente : deux périodes (bornes incluses) ne peuvent
+        # pas se chevaucher. int4range remplace l'égalité sur tenteId (pas besoin de btree_gist).
+        ExcludeConstraint(
+            (func.int4range(tenteId, tenteId, text("'[]'")), "&&"),
+            (func.daterange(debut, fin, text("'[]'")), "&&"),
+            name="ex_reservations_tente_periode",
+            using="gist",
+            where=tenteId.isnot(None),
+        ),
+    )
 
 class Controle(Base):
     __tablename__ = "controles"
@@ -45,6 +93,21 @@ class Controle(Base):
     checklist = Column(JSON)
     remarques = Column(Text)
     image_url = Column(String, nullable=True)
+    # Renditions produites en tâche de fond après l'upload de la photo
+    thumbnail_url = Column(String, nullable=True)
+    medium_url = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # Dénormalisé depuis la tente : contrôle d'accès sans jointure
+    groupeId = Column(Integer, ForeignKey("groupes.id"))
+
+    __table_args__ = (
+        # Liste /v2/controles : filtre groupe, pagination keyset (date, id) décroissante, date NULL en dernier
+        Index("ix_controles_groupe_date_id", "groupeId", keyset_date(date).desc(), id.desc()),
+        # Synchronisation delta : modifications d'un groupe depuis un instant
+        Index("ix_controles_groupe_updated_at", "groupeId", "updated_at"),
+        # Dernier contrôle par tente (DISTINCT ON tenteId ... ORDER BY date DESC, id DESC), date NULL en dernier
+        Index("ix_controles_tente_date", "tenteId", keyset_date(date).desc(), id.desc()),
+    )
 
 class Groupe(Base):
     __tablename__ = "groupes"
@@ -58,6 +121,19 @@ class Groupe(Base):
     type = Column(String, nullable=True)
     units = Column(JSON, nullable=True)
 
+# Configuration de recherche plein texte des menus
+MENU_SEARCH_CONFIG = "french"
+
+def menu_search_document(title, description, instructions):
+    """
+    Document plein texte d'un menu, pondéré : titre (A) > description (B) > instructions (C).
+    Littéraux en ligne (pas de paramètres) pour que la requête corresponde à l'index GIN.
+    """
+    config = text(f"'{MENU_SEARCH_CONFIG}'::regconfig")
+    def weighted(column, weight):
+        return func.setweight(func.to_tsvector(config, func.coalesce(column, text("''"))), text(f"'{weight}'"))
+    return weighted(title, "A").op("||")(weighted(description, "B")).op("||")(weighted(instructions, "C"))
+
 class Menu(Base):
     __tablename__ = "menus"
     id = Column(Integer, primary_key=True, index=True)
@@ -69,6 +145,14 @@ class Menu(Base):
     allergens = Column(ARRAY(String))  # set d'allergènes
     tags = Column(ARRAY(String))  # set de tags
 
+    __table_args__ = (
+        # Recherche de /v2/menus : texte, tags requis (@>), catégorie.
+        # Pas d'index sur allergens : l'exclusion (NOT &&) ne peut pas s'appuyer sur un GIN
+        Index("ix_menus_search", menu_search_document(title, description, instructions), postgresql_using="gin"),
+        Index("ix_menus_tags", "tags", postgresql_using="gin"),
+        Index("ix_menus_category", "category"),
+    )
+
 class EventMenu(Base):
     __tablename__ = "event_menus"
     id = Column(Integer, primary_key=True, index=True)
@@ -76,4 +160,34 @@ class EventMenu(Base):
     menu_id = Column(Integer, ForeignKey("menus.id"), nullable=False)
     day_number = Column(Integer, nullable=False)
     type_repas = Column(String, nullable=False)
-    quantite_personnes = Column(Integer)  # optionnel, pour override
\ No newline at end of file
+    quantite_personnes = Column(Integer)  # optionnel, pour override
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    groupeId = Column(Integer, ForeignKey("groupes.id"))  # dénormalisé depuis l'événement
+
+    __table_args__ = (
+        # Repas d'un événement (liste de courses, tableau de bord)
+        Index("ix_event_menus_event_updated_at", "event_id", "updated_at"),
+        # Synchronisation delta : modifications d'un groupe depuis un instant
+        Index("ix_event_menus_groupe_updated_at", "groupeId", "updated_at"),
+    )
+
+class CollectionVersion(Base):
+    # Version d'une collection (tentes, evenements, controles) par groupe,
+    # incrémentée à chaque écriture : sert à calculer les ETag des réponses v2
+    __tablename__ = "collection_versions"
+    groupeId = Column(Integer, primary_key=True)
+    collection = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class Deletion(Base):
+    # Trace des suppressions (tombstones) pour la synchronisation delta des clients hors ligne
+    __tablename__ = "deletions"
+    id = Column(BigInteger, primary_key=True)
+    groupeId = Column(Integer, nullable=False)
+    collection = Column(String, nullable=False)  # "tentes", "evenements", "controles", "event_menus"
+    objectId = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_deletions_groupe_deleted_at", "groupeId", "deleted_at"),
+    )
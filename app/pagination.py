@@ -0,0 +1,137 @@
+import base64
+import json
+import os
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import Date, DateTime, Float, Integer, String, literal, tuple_
+
+from app.models import keyset_date
+
+DEFAULT_PAGE_LIMIT = int(os.getenv("PAGINATION_DEFAULT_LIMIT", 100))
+MAX_PAGE_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", 500))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """
+    Paramètres de pagination communs aux listes v2 :
+    - limit : taille de page (bornée par PAGINATION_MAX_LIMIT)
+    - cursor : curseur opaque renvoyé dans l'en-tête X-Next-Cursor
+    Sans limit ni cursor, la liste complète est renvoyée (compatibilité).
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+        cursor: Optional[str] = Query(None),
+    ):
+        if limit is None and cursor is not None:
+            limit = DEFAULT_PAGE_LIMIT
+        self.limit = limit
+        self.cursor = cursor
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _from_json(column, value: Any) -> Any:
+    # Chaque valeur est ramenée au type de sa colonne : sinon l'erreur n'apparaîtrait qu'en SQL (500)
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    if isinstance(value, bool):
+        raise ValueError("booléen dans le curseur")
+    if isinstance(column.type, Integer):
+        if not isinstance(value, int):
+            raise ValueError("entier attendu")
+        return value
+    if isinstance(column.type, Float):
+        if not isinstance(value, (int, float)):
+            raise ValueError("nombre attendu")
+        return float(value)
+    if isinstance(column.type, String) and not isinstance(value, str):
+        raise ValueError("texte attendu")
+    return value
+
+
+def _is_nullable_date(column) -> bool:
+    expression = getattr(column, "expression", column)
+    return isinstance(column.type, DateTime) and getattr(expression, "nullable", False)
+
+
+def _sort_key(column):
+    return keyset_date(column) if _is_nullable_date(column) else column
+
+
+def _cursor_value(column, value):
+    # Même expression que la colonne : un curseur pris sur une date NULL devient -infinity
+    return keyset_date(literal(value, type_=column.type)) if _is_nullable_date(column) else value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong cursor arity")
+        return [_from_json(col, v) for col, v in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide",
+        )
+
+
+def apply_keyset(query, columns: Sequence, page: PageParams, descending: bool = False):
+    """
+    Applique un tri stable sur `columns` (la dernière doit être unique, ex. id)
+    et, si une page est demandée, la condition keyset déduite du curseur.
+    Une date nullable est triée et comparée via models.keyset_date (NULL = -infinity).
+    On demande une ligne de plus que `limit` pour savoir s'il reste une page.
+    """
+    keys = [_sort_key(col) for col in columns]
+    if descending:
+        query = query.order_by(*[key.desc() for key in keys])
+    else:
+        query = query.order_by(*keys)
+
+    if page.limit is None:
+        return query
+
+    if page.cursor is not None:
+        values = [_cursor_value(col, value) for col, value in zip(columns, decode_cursor(page.cursor, columns))]
+        if len(columns) == 1:
+            key, after = keys[0], values[0]
+        else:
+            key, after = tuple_(*keys), tuple_(*values)
+        query = query.filter(key < after if descending else key > after)
+
+    return query.limit(page.limit + 1)
+
+
+def finish_page(rows: List[Any], columns: Sequence, page: PageParams, response: Response) -> List[Any]:
+    """
+    Retire la ligne sentinelle et expose le curseur suivant dans l'en-tête X-Next-Cursor.
+    """
+    if page.limit is None or len(rows) <= page.limit:
+        return rows
+    rows = rows[:page.limit]
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+        [getattr(last, col.key) for col in columns]
+    )
+    return rows
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Nombre de temps d'attente conservés pour les percentiles
+WAIT_SAMPLES = 2048
+
+
+class PoolStats:
+    """
+    Compteurs d'un pool de connexions : attente au checkout, connexions empruntées,
+    usage de l'overflow et timeouts ("QueuePool limit ... overflow").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._waits.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_usage(self, checked_out: int, overflow: int):
+        with self._lock:
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            checkouts = self.checkouts
+            total_wait = self.total_wait
+
+        def percentile(p):
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 3)
+
+        return {
+            "checked_out": pool.checkedout(),
+            # overflow() est négatif tant que le pool n'a pas ouvert toutes ses connexions
+            "overflow_in_use": max(pool.overflow(), 0),
+            "peak_checked_out": self.peak_checked_out,
+            "peak_overflow": self.peak_overflow,
+            "checkouts": checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "checkout_wait_ms": {
+                "avg": round(total_wait / checkouts * 1000, 3) if checkouts else None,
+                "max": round(self.max_wait * 1000, 3),
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+            },
+        }
+
+
+class _InstrumentedPoolMixin:
+    """
+    Mesure le temps d'attente de chaque checkout (attente d'une connexion libre,
+    ouverture éventuelle et pre-ping compris). Les stats survivent à recreate().
+    """
+
+    stats: PoolStats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine) -> PoolStats:
+    """
+    Branche les événements du pool de `engine` (moteur sync ou `async_engine.sync_engine`).
+    """
+    stats = PoolStats()
+    engine.pool.stats = stats
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = engine.pool
+        stats.record_usage(pool.checkedout(), max(pool.overflow(), 0))
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+    return stats
@@ -0,0 +1,62 @@
+# app/routes/internal.py
+
+import os
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+
+from app import metrics, storage
+from app.shopping_list import shopping_list_cache
+from app.database import get_pool_stats
+from app.routes.v2.deps import group_cache
+
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+
+def require_internal_token(
+    x_internal_token: str | None = Header(None),
+    authorization: str | None = Header(None),
+):
+    """
+    Les routes internes ne sont exposées que si INTERNAL_API_TOKEN est défini,
+    et uniquement aux appels qui présentent ce jeton dans X-Internal-Token
+    (ou Authorization: Bearer, seul en-tête que Prometheus sait envoyer).
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_internal_token and authorization and authorization.lower().startswith("bearer "):
+        x_internal_token = authorization[len("bearer "):]
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Accès refusé")
+
+
+router = APIRouter(
+    prefix="/internal",
+    dependencies=[Depends(require_internal_token)],
+    include_in_schema=False,
+)
+
+# /metrics à la racine, où Prometheus l'attend par défaut
+metrics_router = APIRouter(
+    dependencies=[Depends(require_internal_token)],
+    include_in_schema=False,
+)
+
+
+@router.get("/stats")
+def get_stats():
+    """
+    Compteurs internes, pour dimensionner les caches, le pool de connexions et le stockage.
+    """
+    return {
+        "group_cache": group_cache.stats(),
+        "shopping_list_cache": shopping_list_cache.stats(),
+        "db_pool": get_pool_stats(),
+        "storage": storage.get_stats(),
+    }
+
+
+@metrics_router.get("/metrics")
+def get_metrics():
+    """Métriques au format texte Prometheus (requêtes HTTP, SQL, stockage, pool)."""
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,18 +1,15 @@
 from datetime import timedelta
 from fastapi import APIRouter, Body, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from jose import JWTError
 
-from app import models, schemas, database
+from app import models, schemas
+from app.database import get_async_db
 from app.security import verify_password, create_access_token, create_refresh_token, hash_password, decode_token, ACCESS_TOKEN_EXPIRE_MINUTES
-
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.sql_budget import sql_budget
 
 router = APIRouter()
 
@@ -42,14 +39,14 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/auth/login")
-def login(payload: LoginRequest = Body(...), db: Session = Depends(get_db)):
-    groupe = (
-        db.query(models.Groupe)
+async def login(payload: LoginRequest = Body(...), db: AsyncSession = Depends(get_async_db)):
+    groupe = await db.scalar(
+        select(models.Groupe)
         .filter(models.Groupe.userlogin == payload.userlogin)
-        .first()
     )
 
-    if not groupe or not verify_password(payload.mdp, groupe.mdp):
+    # argon2 est volontairement coûteux en CPU : hors de la boucle asyncio
+    if not groupe or not await run_in_threadpool(verify_password, payload.mdp, groupe.mdp):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Identifiants invalides",
@@ -76,18 +73,18 @@ def login(payload: LoginRequest = Body(...), db: Session = Depends(get_db)):
 
 
 @router.post("/auth/create_group", response_model=schemas.GroupeProfile, status_code=201)
-def create_group(groupe: schemas.GroupeCreate, db: Session = Depends(get_db)):
+@sql_budget(2)
+async def create_group(groupe: schemas.GroupeCreate, db: AsyncSession = Depends(get_async_db)):
 
-    if db.query(models.Groupe).filter(models.Groupe.userlogin == groupe.userlogin).first():
+    if await db.scalar(select(models.Groupe).filter(models.Groupe.userlogin == groupe.userlogin)):
         raise HTTPException(status_code=400, detail="userlogin déjà utilisé")
     data = groupe.dict()
     plain_password = data.pop("mdp")
-    hashed_password = hash_password(plain_password)
+    hashed_password = await run_in_threadpool(hash_password, plain_password)
     db_groupe = models.Groupe(**data, mdp=hashed_password)
 
     db.add(db_groupe)
-    db.commit()
-    db.refresh(db_groupe)
+    await db.commit()
 
     return _to_group_profile(db_groupe)
 
@@ -101,7 +98,7 @@ class TokenOut(BaseModel):
     token_type: str = "bearer"
 
 @router.post("/auth/refresh", response_model=TokenOut)
-def refresh(payload: RefreshIn):
+async def refresh(payload: RefreshIn):
     try:
         claims = decode_token(payload.refresh_token)
     except JWTError:
@@ -1,56 +1,93 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Body, HTTPException, Depends, Request, Response, status, Query, UploadFile, File
+import logging
 import os
+import re
 import time
-from app import storage
-from sqlalchemy.orm import Session
+from app import controle_import, etag, fast_json, images, storage, sync
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from app import models, schemas
-from app.database import get_db
+from app.database import async_session, get_async_db
+from app.pagination import PageParams, apply_keyset, finish_page
 from app.routes.v2.deps import get_current_groupe  # 🔑 groupe courant via JWT
+from app.sql_budget import sql_budget
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Clé de pagination keyset : (date, id), les contrôles les plus récents d'abord
+CONTROLE_PAGE_KEYS = (models.Controle.date, models.Controle.id)
+
 
 @router.get("/controles", response_model=List[schemas.Controle])
-def list_controles(
+@sql_budget(3)
+async def list_controles(
+    request: Request,
+    response: Response,
     tenteId: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
     Liste les contrôles des tentes appartenant au groupe courant,
-    optionnellement filtrés par tenteId.
+    optionnellement filtrés par tenteId, du plus récent au plus ancien.
+    Pagination optionnelle via `limit` / `cursor` (curseur suivant dans X-Next-Cursor).
+    ETag / If-None-Match : 304 si la collection n'a pas changé.
     """
-    query = (
-        db.query(models.Controle)
-        .join(models.Tente, models.Controle.tenteId == models.Tente.id)
-        .filter(models.Tente.groupeId == current_groupe.id)
-    )
+    not_modified = await etag.check_not_modified(request, response, db, current_groupe.id, etag.CONTROLES)
+    if not_modified:
+        return not_modified
+
+    query = select(models.Controle).filter(models.Controle.groupeId == current_groupe.id)
 
     if tenteId is not None:
         query = query.filter(models.Controle.tenteId == tenteId)
 
-    return query.all()
+    query = apply_keyset(query, CONTROLE_PAGE_KEYS, page, descending=True)
+    controles = finish_page((await db.scalars(query)).all(), CONTROLE_PAGE_KEYS, page, response)
+    return fast_json.list_response(schemas.Controle, controles, response)
+
+
+async def latest_controles_by_tente(db: AsyncSession, tente_ids: List[int]) -> dict:
+    """
+    Dernier contrôle de chaque tente en une requête (DISTINCT ON tenteId),
+    servie par l'index (tenteId, date DESC, id DESC). Comme pour la pagination,
+    un contrôle sans date passe après les contrôles datés. Renvoie {tenteId: Controle}.
+    """
+    if not tente_ids:
+        return {}
+    controles = await db.scalars(
+        select(models.Controle)
+        .filter(models.Controle.tenteId.in_(tente_ids))
+        .distinct(models.Controle.tenteId)
+        .order_by(
+            models.Controle.tenteId,
+            models.keyset_date(models.Controle.date).desc(),
+            models.Controle.id.desc(),
+        )
+    )
+    return {controle.tenteId: controle for controle in controles.all()}
 
 
-def _get_controle_for_current_groupe(
+async def _get_controle_for_current_groupe(
     controle_id: int,
-    db: Session,
+    db: AsyncSession,
     current_groupe: models.Groupe,
 ) -> models.Controle:
     """
     Helper : récupère un contrôle si la tente associée
     appartient au groupe courant, sinon 404.
     """
-    controle = (
-        db.query(models.Controle)
-        .join(models.Tente, models.Controle.tenteId == models.Tente.id)
+    controle = await db.scalar(
+        select(models.Controle)
         .filter(
             models.Controle.id == controle_id,
-            models.Tente.groupeId == current_groupe.id,
+            models.Controle.groupeId == current_groupe.id,
         )
-        .first()
     )
     if not controle:
         raise HTTPException(
@@ -61,64 +98,139 @@ def _get_controle_for_current_groupe(
 
 
 @router.post("/controles", response_model=schemas.Controle, status_code=201)
-def create_controle(
+@sql_budget(4)
+async def create_controle(
     controle: schemas.ControleCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
     Crée un contrôle uniquement si la tente liée
     appartient au groupe courant.
     """
-    tente = (
-        db.query(models.Tente)
+    tente_id = await db.scalar(
+        select(models.Tente.id)
         .filter(
             models.Tente.id == controle.tenteId,
             models.Tente.groupeId == current_groupe.id,
         )
-        .first()
     )
-    if not tente:
+    if tente_id is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Tente non trouvée ou n'appartient pas à ce groupe",
         )
 
-    db_controle = models.Controle(**controle.dict())
+    db_controle = models.Controle(**controle.dict(), groupeId=current_groupe.id)  # 🔒 groupe de la tente
     db.add(db_controle)
-    db.commit()
-    db.refresh(db_controle)
+    await etag.bump_version(db, current_groupe.id, etag.CONTROLES)
+    await db.commit()
     return db_controle
 
 
+@router.post("/controles/import", response_model=schemas.ControleImportReport)
+@sql_budget(allow_repeats=True)
+async def import_controles(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Import en masse d'historiques de contrôles depuis un fichier CSV ou NDJSON.
+    Le fichier est lu et validé par paquets de CONTROLE_IMPORT_CHUNK_SIZE lignes :
+    une seule requête IN pour vérifier les tentes du paquet, puis un INSERT groupé
+    et un commit par paquet. Les lignes invalides sont ignorées et listées dans le rapport.
+    """
+    fmt = format or controle_import.detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format non reconnu : utiliser un fichier .csv ou .ndjson, ou le paramètre format",
+        )
+
+    records = controle_import.iter_records(file.file, fmt)
+    report = {"format": fmt, "total_rows": 0, "imported": 0, "rejected": 0, "errors": [], "errors_truncated": False}
+
+    def reject(line: int, error: str):
+        report["rejected"] += 1
+        if len(report["errors"]) < controle_import.IMPORT_MAX_ERRORS:
+            report["errors"].append({"line": line, "error": error})
+        else:
+            report["errors_truncated"] = True
+
+    done = False
+    while not done:
+        valid, errors, done = await run_in_threadpool(controle_import.next_chunk, records)
+        report["total_rows"] += len(valid) + len(errors)
+
+        tente_ids = {controle.tenteId for _, controle in valid}
+        owned = set()
+        if tente_ids:
+            owned = set(
+                (
+                    await db.scalars(
+                        select(models.Tente.id).filter(
+                            models.Tente.id.in_(tente_ids),
+                            models.Tente.groupeId == current_groupe.id,
+                        )
+                    )
+                ).all()
+            )
+
+        rows = []
+        for line, controle in valid:
+            if controle.tenteId in owned:
+                rows.append({**controle.dict(), "groupeId": current_groupe.id})
+            else:
+                errors.append((line, "Tente non trouvée ou n'appartient pas à ce groupe"))
+        for line, error in sorted(errors):
+            reject(line, error)
+
+        if rows:
+            await db.execute(insert(models.Controle), rows)
+            await etag.bump_version(db, current_groupe.id, etag.CONTROLES)
+            await db.commit()
+            report["imported"] += len(rows)
+
+    return report
+
+
 @router.get("/controles/{controle_id}", response_model=schemas.Controle)
-def get_controle(
+@sql_budget(3)
+async def get_controle(
     controle_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    return _get_controle_for_current_groupe(controle_id, db, current_groupe)
+    controle = await _get_controle_for_current_groupe(controle_id, db, current_groupe)
+    not_modified = await etag.check_not_modified(request, response, db, current_groupe.id, etag.CONTROLES)
+    if not_modified:
+        return not_modified
+    return controle
 
 
 @router.put("/controles/{controle_id}", response_model=schemas.Controle)
-def update_controle(
+@sql_budget(5)
+async def update_controle(
     controle_id: int,
     controle: schemas.ControleUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_controle = _get_controle_for_current_groupe(controle_id, db, current_groupe)
+    db_controle = await _get_controle_for_current_groupe(controle_id, db, current_groupe)
 
     for key, value in controle.dict(exclude_unset=True).items():
         if key == "tenteId" and value is not None:
             # Vérifier que la nouvelle tente appartient toujours au groupe
-            tente = (
-                db.query(models.Tente)
+            tente = await db.scalar(
+                select(models.Tente)
                 .filter(
                     models.Tente.id == value,
                     models.Tente.groupeId == current_groupe.id,
                 )
-                .first()
             )
             if not tente:
                 raise HTTPException(
@@ -127,45 +239,167 @@ def update_controle(
                 )
         setattr(db_controle, key, value)
 
-    db.commit()
-    db.refresh(db_controle)
+    await etag.bump_version(db, current_groupe.id, etag.CONTROLES)
+    await db.commit()
     return db_controle
 
 
 @router.delete("/controles/{controle_id}", status_code=204)
-def delete_controle(
+async def delete_controle(
     controle_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    controle = _get_controle_for_current_groupe(controle_id, db, current_groupe)
-    db.delete(controle)
-    db.commit()
+    controle = await _get_controle_for_current_groupe(controle_id, db, current_groupe)
+    await db.delete(controle)
+    await sync.record_deletions(db, current_groupe.id, etag.CONTROLES, [controle_id])
+    await etag.bump_version(db, current_groupe.id, etag.CONTROLES)
+    await db.commit()
     return
 
 
+def _picture_object_name(groupe_id: int, controle_id: int, filename: Optional[str]) -> str:
+    """
+    Clé de l'objet : toujours sous le préfixe {groupe_id}/{controle_id}/,
+    avec un nom de fichier réduit à des caractères sûrs.
+    """
+    now = int(time.time())
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename or "")).lstrip(".")
+    return f"{groupe_id}/{controle_id}/{now}_{safe_name or f'upload_{now}'}"
+
+
+async def _generate_controle_renditions(groupe_id: int, controle_id: int, bucket: str, object_name: str, image_url: str):
+    """
+    Tâche de fond : miniature et taille moyenne produites sur le pool de process,
+    puis rattachées au contrôle s'il pointe toujours vers la même photo.
+    """
+    try:
+        renditions = await images.generate_renditions(bucket, object_name)
+    except Exception:
+        logger.exception("Échec des renditions pour %s/%s", bucket, object_name)
+        return
+
+    async with async_session() as db:
+        controle = await db.get(models.Controle, controle_id)
+        if controle is None or controle.image_url != image_url:
+            return
+        controle.thumbnail_url = storage.get_public_url(bucket, renditions["thumbnail"])
+        controle.medium_url = storage.get_public_url(bucket, renditions["medium"])
+        await etag.bump_version(db, groupe_id, etag.CONTROLES)
+        await db.commit()
+
+
+async def _attach_picture(
+    db: AsyncSession,
+    groupe_id: int,
+    controle: models.Controle,
+    bucket: str,
+    object_name: str,
+    background_tasks: BackgroundTasks,
+):
+    url = storage.get_public_url(bucket, object_name)
+    controle.image_url = url
+    # Les renditions de l'ancienne photo ne sont plus valables jusqu'à la fin du traitement
+    controle.thumbnail_url = None
+    controle.medium_url = None
+    await etag.bump_version(db, groupe_id, etag.CONTROLES)
+    background_tasks.add_task(_generate_controle_renditions, groupe_id, controle.id, bucket, object_name, url)
+
+
 @router.post("/controles/{controle_id}/picture", response_model=schemas.Controle)
 async def upload_controle_picture(
     controle_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """Upload a picture for a controle. The controle must belong to the current groupe."""
-    controle = _get_controle_for_current_groupe(controle_id, db, current_groupe)
+    controle = await _get_controle_for_current_groupe(controle_id, db, current_groupe)
 
-    data = await file.read()
     bucket = os.environ.get("MINIO_BUCKET", "logistiscout-prod")
-    filename = file.filename or f"upload_{int(time.time())}"
-    object_name = f"{current_groupe.id}/{controle_id}/{int(time.time())}_{filename}"
+    object_name = _picture_object_name(current_groupe.id, controle_id, file.filename)
 
+    # Le fichier est déjà spoolé sur disque par le parseur multipart : on le relaie
+    # par parts bornées, dans le threadpool pour ne pas bloquer la boucle asyncio.
     try:
-        storage.upload_bytes(bucket, object_name, data, content_type=file.content_type)
+        await storage.run_blocking(
+            storage.upload_stream,
+            bucket,
+            object_name,
+            file.file,
+            file.size if file.size is not None else -1,
+            file.content_type,
+        )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Upload failed: {e}")
 
-    url = storage.get_public_url(bucket, object_name)
-    controle.image_url = url
-    db.commit()
-    db.refresh(controle)
+    await _attach_picture(db, current_groupe.id, controle, bucket, object_name, background_tasks)
+    await db.commit()
+    return controle
+
+
+@router.post("/controles/{controle_id}/picture/upload-url", response_model=schemas.ControlePictureUploadUrl)
+async def create_controle_picture_upload_url(
+    controle_id: int,
+    payload: schemas.ControlePictureUploadRequest = Body(default_factory=schemas.ControlePictureUploadRequest),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Étape 1 de l'upload direct : renvoie une URL PUT pré-signée vers le stockage objet,
+    limitée à une clé sous {groupe_id}/{controle_id}/. Les octets ne passent pas par l'API.
+    """
+    await _get_controle_for_current_groupe(controle_id, db, current_groupe)
+
+    bucket = os.environ.get("MINIO_BUCKET", "logistiscout-prod")
+    object_name = _picture_object_name(current_groupe.id, controle_id, payload.filename)
+    try:
+        await storage.run_blocking(storage.ensure_bucket, bucket)
+        upload_url = await storage.run_blocking(storage.presigned_put_url, bucket, object_name)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Presign failed: {e}")
+
+    return schemas.ControlePictureUploadUrl(
+        upload_url=upload_url,
+        object_name=object_name,
+        expires_in=storage.MINIO_PRESIGN_EXPIRES,
+    )
+
+
+@router.post("/controles/{controle_id}/picture/confirm", response_model=schemas.Controle)
+async def confirm_controle_picture_upload(
+    controle_id: int,
+    payload: schemas.ControlePictureConfirm,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Étape 2 de l'upload direct : vérifie que l'objet a bien été déposé sous le préfixe
+    du contrôle, puis le rattache au contrôle (image_url).
+    """
+    controle = await _get_controle_for_current_groupe(controle_id, db, current_groupe)
+
+    prefix = f"{current_groupe.id}/{controle_id}/"
+    object_name = payload.object_name
+    if not object_name.startswith(prefix) or "/" in object_name[len(prefix):]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Objet hors du préfixe de ce contrôle",
+        )
+
+    bucket = os.environ.get("MINIO_BUCKET", "logistiscout-prod")
+    try:
+        stat = await storage.run_blocking(storage.stat_object, bucket, object_name)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Storage check failed: {e}")
+    if stat is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Objet introuvable : l'upload n'a pas abouti",
+        )
+
+    await _attach_picture(db, current_groupe.id, controle, bucket, object_name, background_tasks)
+    await db.commit()
     return controle
@@ -1,23 +1,57 @@
+import os
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.cache import TTLCache
+from app.database import get_async_db
 from app import models
 from app.security import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v2/auth/login")
 
+# Cache des groupes authentifiés, indexé par le `sub` du JWT.
+# GROUP_CACHE_TTL=0 ou GROUP_CACHE_MAXSIZE=0 désactive le cache.
+group_cache = TTLCache(
+    maxsize=int(os.getenv("GROUP_CACHE_MAXSIZE", 1024)),
+    ttl=float(os.getenv("GROUP_CACHE_TTL", 30)),
+)
+
+_GROUPE_COLUMNS = [attr.key for attr in inspect(models.Groupe).column_attrs]
+
+
+def invalidate_groupe(groupe_id: int) -> None:
+    """À appeler après toute écriture sur un groupe."""
+    group_cache.invalidate(str(groupe_id))
+
+
+async def get_groupe_for_update(db: AsyncSession, current_groupe: models.Groupe) -> models.Groupe:
+    """
+    Le groupe fourni par get_current_groupe peut venir du cache (objet détaché) :
+    pour le modifier, on recharge la ligne dans la session courante.
+    """
+    groupe = await db.get(models.Groupe, current_groupe.id)
+    if groupe is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Jeton invalide ou expiré",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return groupe
+
 
-def get_current_groupe(
+async def get_current_groupe(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> models.Groupe:
     """
     - Récupère le token dans Authorization: Bearer <token>
     - Décode le JWT
-    - Charge le Groupe dans la BDD
+    - Charge le Groupe depuis le cache, sinon depuis la BDD
+    Le groupe renvoyé est en lecture seule : voir get_groupe_for_update.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,9 +68,14 @@ def get_current_groupe(
     except JWTError:
         raise credentials_exception
 
+    cached = group_cache.get(groupe_id)
+    if cached is not None:
+        return models.Groupe(**cached)
+
     # Récupération du groupe en BDD
-    groupe = db.query(models.Groupe).filter(models.Groupe.id == int(groupe_id)).first()
+    groupe = await db.scalar(select(models.Groupe).filter(models.Groupe.id == int(groupe_id)))
     if groupe is None:
         raise credentials_exception
 
+    group_cache.set(groupe_id, {key: getattr(groupe, key) for key in _GROUPE_COLUMNS})
     return groupe
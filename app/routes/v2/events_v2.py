@@ -1,36 +1,53 @@
 # app/routes/v2/evenements_v2.py
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app import models, schemas
-from app.database import get_db
+from app import etag, fast_json, models, schemas, shopping_list, sync
+from app.database import get_async_db
+from app.pagination import PageParams, apply_keyset, finish_page
+from app.routes.v2.controls_v2 import latest_controles_by_tente
 from app.routes.v2.deps import get_current_groupe  # 🔑 récupère le groupe depuis le JWT
+from app.sql_budget import sql_budget
 
 router = APIRouter()
 
+# Clé de pagination keyset : (date, id), dans l'ordre chronologique
+EVENEMENT_PAGE_KEYS = (models.Evenement.date, models.Evenement.id)
+
 
 @router.get("/evenements", response_model=List[schemas.Evenement])
-def list_evenements(
-    db: Session = Depends(get_db),
+@sql_budget(3)
+async def list_evenements(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
     Ne retourne que les événements du groupe lié au token.
     Le client n'envoie plus de groupeId.
+    Pagination optionnelle via `limit` / `cursor` (curseur suivant dans X-Next-Cursor).
+    ETag / If-None-Match : 304 si la collection n'a pas changé.
     """
-    return (
-        db.query(models.Evenement)
-        .filter(models.Evenement.groupeId == current_groupe.id)
-        .all()
-    )
+    not_modified = await etag.check_not_modified(request, response, db, current_groupe.id, etag.EVENEMENTS)
+    if not_modified:
+        return not_modified
+
+    query = select(models.Evenement).filter(models.Evenement.groupeId == current_groupe.id)
+    query = apply_keyset(query, EVENEMENT_PAGE_KEYS, page)
+    evenements = finish_page((await db.scalars(query)).all(), EVENEMENT_PAGE_KEYS, page, response)
+    return fast_json.list_response(schemas.Evenement, evenements, response)
 
 
 @router.post("/evenements", response_model=schemas.Evenement, status_code=201)
-def create_evenement(
+@sql_budget(3)
+async def create_evenement(
     evenement: schemas.EvenementCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
@@ -42,27 +59,26 @@ def create_evenement(
 
     db_evenement = models.Evenement(**data)
     db.add(db_evenement)
-    db.commit()
-    db.refresh(db_evenement)
+    await etag.bump_version(db, current_groupe.id, etag.EVENEMENTS)
+    await db.commit()
     return db_evenement
 
 
-def _get_evenement_for_current_groupe(
+async def _get_evenement_for_current_groupe(
     evenement_id: int,
-    db: Session,
+    db: AsyncSession,
     current_groupe: models.Groupe,
 ) -> models.Evenement:
     """
     Helper interne : récupère l'événement si il appartient au groupe courant,
     sinon 404.
     """
-    evenement = (
-        db.query(models.Evenement)
+    evenement = await db.scalar(
+        select(models.Evenement)
         .filter(
             models.Evenement.id == evenement_id,
             models.Evenement.groupeId == current_groupe.id,
         )
-        .first()
     )
     if not evenement:
         raise HTTPException(
@@ -73,22 +89,29 @@ def _get_evenement_for_current_groupe(
 
 
 @router.get("/evenements/{evenement_id}", response_model=schemas.Evenement)
-def get_evenement(
+async def get_evenement(
     evenement_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    return _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
+    evenement = await _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
+    not_modified = await etag.check_not_modified(request, response, db, current_groupe.id, etag.EVENEMENTS)
+    if not_modified:
+        return not_modified
+    return evenement
 
 
 @router.put("/evenements/{evenement_id}", response_model=schemas.Evenement)
-def update_evenement(
+@sql_budget(4)
+async def update_evenement(
     evenement_id: int,
     evenement: schemas.EvenementUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_evenement = _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
+    db_evenement = await _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
 
     for key, value in evenement.dict(exclude_unset=True).items():
         # On évite qu'un client ne change le groupeId
@@ -96,19 +119,122 @@ def update_evenement(
             continue
         setattr(db_evenement, key, value)
 
-    db.commit()
-    db.refresh(db_evenement)
+    await etag.bump_version(db, current_groupe.id, etag.EVENEMENTS)
+    await db.commit()
     return db_evenement
 
 
 @router.delete("/evenements/{evenement_id}", status_code=204)
-def delete_evenement(
+@sql_budget(5)
+async def delete_evenement(
     evenement_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_evenement = _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
+    db_evenement = await _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
 
-    db.delete(db_evenement)
-    db.commit()
+    await db.delete(db_evenement)
+    await sync.record_deletions(db, current_groupe.id, etag.EVENEMENTS, [evenement_id])
+    await etag.bump_version(db, current_groupe.id, etag.EVENEMENTS)
+    await db.commit()
     return
+
+
+@router.get("/evenements/{evenement_id}/shopping-list", response_model=schemas.ShoppingList)
+@sql_budget(4)
+async def get_shopping_list(
+    evenement_id: int,
+    personnes: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Liste de courses de l'événement : ingrédients de tous ses repas, multipliés par
+    le nombre de personnes (quantite_personnes du repas, sinon `personnes`),
+    sommés par ingrédient avec unités normalisées, au total et par jour.
+    Résultat mis en cache jusqu'à la prochaine modification des repas ou des menus.
+    """
+    await _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
+
+    # Versions lues avant les repas : le résultat mis en cache n'est jamais plus ancien que sa clé
+    versions = await etag.get_version_pairs(
+        db, [(current_groupe.id, etag.EVENT_MENUS), (etag.SHARED_GROUPE_ID, etag.MENUS)]
+    )
+    key = (evenement_id, personnes, *versions)
+    cached = shopping_list.shopping_list_cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = await db.execute(
+        select(models.EventMenu.day_number, models.EventMenu.quantite_personnes, models.Menu.ingredients)
+        .join(models.Menu, models.EventMenu.menu_id == models.Menu.id)
+        .filter(models.EventMenu.event_id == evenement_id)
+    )
+    result = shopping_list.build_shopping_list(evenement_id, rows, personnes)
+    shopping_list.shopping_list_cache.set(key, result)
+    return result
+
+
+@router.get("/evenements/{evenement_id}/dashboard", response_model=schemas.EvenementDashboard)
+@sql_budget(5)
+async def get_evenement_dashboard(
+    evenement_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Vue d'ensemble d'un événement en un appel : tentes associées (tentesAssociees
+    ou réservées pour l'événement) avec leur dernier contrôle, et repas par jour.
+    Nombre fixe de requêtes, quel que soit le nombre de tentes ou de jours.
+    """
+    evenement = await _get_evenement_for_current_groupe(evenement_id, db, current_groupe)
+
+    reservees = select(models.Reservation.tenteId).filter(
+        models.Reservation.groupeId == current_groupe.id,  # index, pas de parcours de toute la table
+        models.Reservation.evenementId == evenement_id,
+    )
+    tentes = (
+        await db.scalars(
+            select(models.Tente)
+            .filter(
+                models.Tente.groupeId == current_groupe.id,
+                or_(
+                    models.Tente.id.in_(evenement.tentesAssociees or []),
+                    models.Tente.id.in_(reservees),
+                ),
+            )
+            .order_by(models.Tente.id)
+        )
+    ).all()
+
+    derniers_controles = await latest_controles_by_tente(db, [tente.id for tente in tentes])
+
+    repas = await db.execute(
+        select(models.EventMenu, models.Menu)
+        .join(models.Menu, models.EventMenu.menu_id == models.Menu.id)
+        .filter(models.EventMenu.event_id == evenement_id)
+        .order_by(models.EventMenu.day_number, models.EventMenu.type_repas, models.EventMenu.id)
+    )
+    jours = {}
+    for event_menu, menu in repas:
+        jours.setdefault(event_menu.day_number, []).append({
+            "event_menu_id": event_menu.id,
+            "type_repas": event_menu.type_repas,
+            "quantite_personnes": event_menu.quantite_personnes,
+            "menu": menu,
+        })
+
+    etats = {}
+    for tente in tentes:
+        etat = tente.etat or "inconnu"
+        etats[etat] = etats.get(etat, 0) + 1
+
+    return {
+        "evenement": evenement,
+        "tentes": [
+            {"tente": tente, "dernier_controle": derniers_controles.get(tente.id)}
+            for tente in tentes
+        ],
+        "etats": etats,
+        "jours": [{"day_number": day, "repas": items} for day, items in jours.items()],
+    }
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
-from app.database import get_db
-from app.routes.v2.deps import get_current_groupe
+from app.database import get_async_db
+from app.routes.v2.deps import get_current_groupe, get_groupe_for_update, invalidate_groupe
+from app.sql_budget import sql_budget
 
 router = APIRouter()
 
@@ -28,7 +30,7 @@ def _to_group_profile(current_groupe: models.Groupe) -> dict:
 
 
 @router.get("/me", response_model=schemas.GroupeProfile)
-def get_me(current_groupe: models.Groupe = Depends(get_current_groupe)):
+async def get_me(current_groupe: models.Groupe = Depends(get_current_groupe)):
     """
     Get the current authenticated user's information
     """
@@ -36,31 +38,38 @@ def get_me(current_groupe: models.Groupe = Depends(get_current_groupe)):
 
 
 @router.put("/me", response_model=schemas.GroupeProfile)
-def update_me(
+@sql_budget(3)
+async def update_me(
     payload: schemas.GroupeProfileUpdate,
     current_groupe: models.Groupe = Depends(get_current_groupe),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update current group profile fields
     """
-    if payload.email is not None and payload.email != current_groupe.email:
-        existing_email = db.query(models.Groupe).filter(
-            models.Groupe.email == payload.email,
-            models.Groupe.id != current_groupe.id,
-        ).first()
-        if existing_email:
+    current_groupe = await get_groupe_for_update(db, current_groupe)
+
+    # Unicité de l'email et du login vérifiée en une seule requête
+    email_changed = payload.email is not None and payload.email != current_groupe.email
+    login_changed = payload.login is not None and payload.login != current_groupe.userlogin
+    if email_changed or login_changed:
+        conflicts = []
+        if email_changed:
+            conflicts.append(models.Groupe.email == payload.email)
+        if login_changed:
+            conflicts.append(models.Groupe.userlogin == payload.login)
+        existing = (await db.execute(
+            select(models.Groupe.email, models.Groupe.userlogin).filter(
+                or_(*conflicts),
+                models.Groupe.id != current_groupe.id,
+            )
+        )).all()
+        if email_changed and any(row.email == payload.email for row in existing):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cet email est déjà utilisé",
             )
-
-    if payload.login is not None and payload.login != current_groupe.userlogin:
-        existing_login = db.query(models.Groupe).filter(
-            models.Groupe.userlogin == payload.login,
-            models.Groupe.id != current_groupe.id,
-        ).first()
-        if existing_login:
+        if login_changed and any(row.userlogin == payload.login for row in existing):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Ce login est déjà utilisé",
@@ -87,25 +96,27 @@ def update_me(
             for unit in payload.units
         ]
 
-    db.commit()
-    db.refresh(current_groupe)
+    await db.commit()
+    invalidate_groupe(current_groupe.id)
     return _to_group_profile(current_groupe)
 
 
 @router.patch("/me/email", response_model=schemas.Groupe)
-def update_email(
+@sql_budget(3)
+async def update_email(
     payload: schemas.GroupeEmailUpdate,
     current_groupe: models.Groupe = Depends(get_current_groupe),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the email of the current authenticated user
     """
+    current_groupe = await get_groupe_for_update(db, current_groupe)
     # Check if email is already taken by another group
-    existing_groupe = db.query(models.Groupe).filter(
+    existing_groupe = await db.scalar(select(models.Groupe).filter(
         models.Groupe.email == payload.email,
         models.Groupe.id != current_groupe.id
-    ).first()
+    ))
     
     if existing_groupe:
         raise HTTPException(
@@ -114,36 +125,39 @@ def update_email(
         )
     
     current_groupe.email = payload.email
-    db.commit()
-    db.refresh(current_groupe)
+    await db.commit()
+    invalidate_groupe(current_groupe.id)
     return current_groupe
 
 
 @router.patch("/me/members", response_model=schemas.Groupe)
-def update_members(
+@sql_budget(2)
+async def update_members(
     payload: schemas.GroupeMembersUpdate,
     current_groupe: models.Groupe = Depends(get_current_groupe),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the members list of the current authenticated user's group
     """
+    current_groupe = await get_groupe_for_update(db, current_groupe)
     current_groupe.membres = payload.membres
-    db.commit()
-    db.refresh(current_groupe)
+    await db.commit()
+    invalidate_groupe(current_groupe.id)
     return current_groupe
 
 
 @router.patch("/me/nom", response_model=schemas.Groupe)
-def update_nom(
+async def update_nom(
     payload: schemas.GroupeNomUpdate,
     current_groupe: models.Groupe = Depends(get_current_groupe),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the name of the current authenticated user's group
     """
+    current_groupe = await get_groupe_for_update(db, current_groupe)
     current_groupe.nom = payload.nom
-    db.commit()
-    db.refresh(current_groupe)
+    await db.commit()
+    invalidate_groupe(current_groupe.id)
     return current_groupe
@@ -1,19 +1,73 @@
 # app/routes/v2/event_menus_v2.py
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy import cast, func, or_, select, text
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from app import models, schemas
-from app.database import get_db
+from app import etag, fast_json, models, schemas, sync
+from app.database import get_async_db
+from app.pagination import PageParams, apply_keyset, finish_page
+from app.routes.v2.deps import get_current_groupe  # 🔑 groupe courant via JWT
+from app.sql_budget import sql_budget
 
 router = APIRouter()
 
+# Clé de pagination keyset : id
+MENU_PAGE_KEYS = (models.Menu.id,)
+
 @router.get("/menus", response_model=List[schemas.Menu])
-def list_menus(db: Session = Depends(get_db)):
-    return db.query(models.Menu).all()
+async def list_menus(
+    response: Response,
+    q: Optional[str] = Query(None, min_length=1),
+    category: Optional[str] = Query(None),
+    tags: Optional[List[str]] = Query(None),
+    exclude_allergens: Optional[List[str]] = Query(None),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Catalogue des menus, filtrable :
+    - q : recherche plein texte sur titre / description / instructions, résultats classés par pertinence
+    - category : catégorie exacte
+    - tags : tags tous requis (répéter le paramètre : ?tags=vege&tags=rapide)
+    - exclude_allergens : aucun de ces allergènes. Post-filtre, sans index : appliqué aux menus
+      retenus par les autres critères (ou à tout le catalogue s'il est le seul)
+    Pagination optionnelle via `limit` / `cursor` (curseur suivant dans X-Next-Cursor).
+    """
+    query = select(models.Menu)
+    if category is not None:
+        query = query.filter(models.Menu.category == category)
+    if tags:
+        query = query.filter(models.Menu.tags.contains(tags))
+    if exclude_allergens:
+        query = query.filter(
+            or_(models.Menu.allergens.is_(None), ~models.Menu.allergens.overlap(exclude_allergens))
+        )
+
+    if not q:
+        query = apply_keyset(query, MENU_PAGE_KEYS, page)
+        menus = finish_page((await db.scalars(query)).all(), MENU_PAGE_KEYS, page, response)
+        return fast_json.list_response(schemas.Menu, menus, response)
+
+    document = models.menu_search_document(models.Menu.title, models.Menu.description, models.Menu.instructions)
+    tsquery = func.websearch_to_tsquery(text(f"'{models.MENU_SEARCH_CONFIG}'::regconfig"), q)
+    # ts_rank renvoie un real, arrondi dans sa forme texte : en double precision, la valeur
+    # relue dans le curseur reste exactement comparable d'un pilote à l'autre
+    rank = cast(func.ts_rank(document, tsquery), DOUBLE_PRECISION).label("search_rank")
+    # Pagination keyset sur (pertinence, id), du plus pertinent au moins pertinent
+    page_keys = (rank, models.Menu.id)
+    query = apply_keyset(query.add_columns(rank).filter(document.op("@@")(tsquery)), page_keys, page, descending=True)
+
+    menus = []
+    for menu, search_rank in await db.execute(query):
+        menu.search_rank = search_rank
+        menus.append(menu)
+    menus = finish_page(menus, page_keys, page, response)
+    return fast_json.list_response(schemas.Menu, menus, response)
 
 @router.post("/menus", response_model=schemas.Menu, status_code=201)
-def create_menu(menu: schemas.MenuCreate, db: Session = Depends(get_db)):
+async def create_menu(menu: schemas.MenuCreate, db: AsyncSession = Depends(get_async_db)):
     # Validation ingrédients (doit être une liste de dicts avec nom, quantite, unite)
     if menu.ingredients:
         for ing in menu.ingredients:
@@ -21,20 +75,20 @@ def create_menu(menu: schemas.MenuCreate, db: Session = Depends(get_db)):
                 raise HTTPException(status_code=400, detail="Chaque ingrédient doit avoir nom, quantite, unite")
     db_menu = models.Menu(**menu.dict())
     db.add(db_menu)
-    db.commit()
-    db.refresh(db_menu)
+    await db.commit()
     return db_menu
 
 @router.get("/menus/{menu_id}", response_model=schemas.Menu)
-def get_menu(menu_id: int, db: Session = Depends(get_db)):
-    menu = db.query(models.Menu).filter(models.Menu.id == menu_id).first()
+async def get_menu(menu_id: int, db: AsyncSession = Depends(get_async_db)):
+    menu = await db.scalar(select(models.Menu).filter(models.Menu.id == menu_id))
     if not menu:
         raise HTTPException(status_code=404, detail="Menu non trouvé")
     return menu
 
 @router.put("/menus/{menu_id}", response_model=schemas.Menu)
-def update_menu(menu_id: int, menu: schemas.MenuUpdate, db: Session = Depends(get_db)):
-    db_menu = db.query(models.Menu).filter(models.Menu.id == menu_id).first()
+@sql_budget(3)
+async def update_menu(menu_id: int, menu: schemas.MenuUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_menu = await db.scalar(select(models.Menu).filter(models.Menu.id == menu_id))
     if not db_menu:
         raise HTTPException(status_code=404, detail="Menu non trouvé")
     if menu.ingredients:
@@ -43,88 +97,128 @@ def update_menu(menu_id: int, menu: schemas.MenuUpdate, db: Session = Depends(ge
                 raise HTTPException(status_code=400, detail="Chaque ingrédient doit avoir nom, quantite, unite")
     for key, value in menu.dict(exclude_unset=True).items():
         setattr(db_menu, key, value)
-    db.commit()
-    db.refresh(db_menu)
+    # Un menu modifié peut être utilisé par n'importe quel événement : invalide les listes de courses
+    await etag.bump_version(db, etag.SHARED_GROUPE_ID, etag.MENUS)
+    await db.commit()
     return db_menu
 
 @router.delete("/menus/{menu_id}", status_code=204)
-def delete_menu(menu_id: int, db: Session = Depends(get_db)):
-    menu = db.query(models.Menu).filter(models.Menu.id == menu_id).first()
+@sql_budget(3)
+async def delete_menu(menu_id: int, db: AsyncSession = Depends(get_async_db)):
+    menu = await db.scalar(select(models.Menu).filter(models.Menu.id == menu_id))
     if not menu:
         raise HTTPException(status_code=404, detail="Menu non trouvé")
-    db.delete(menu)
-    db.commit()
+    await db.delete(menu)
+    await etag.bump_version(db, etag.SHARED_GROUPE_ID, etag.MENUS)
+    await db.commit()
     return
 
+async def _get_event_menu_for_current_groupe(
+    event_menu_id: int,
+    db: AsyncSession,
+    current_groupe: models.Groupe,
+) -> models.EventMenu:
+    """Helper : récupère un EventMenu du groupe courant (groupeId dénormalisé), sinon 404."""
+    event_menu = await db.scalar(
+        select(models.EventMenu)
+        .filter(
+            models.EventMenu.id == event_menu_id,
+            models.EventMenu.groupeId == current_groupe.id,
+        )
+    )
+    if not event_menu:
+        raise HTTPException(status_code=404, detail="EventMenu non trouvé")
+    return event_menu
+
+async def _check_event_for_current_groupe(event_id: int, db: AsyncSession, current_groupe: models.Groupe):
+    """L'événement d'un EventMenu doit appartenir au groupe courant."""
+    evenement_id = await db.scalar(
+        select(models.Evenement.id).filter(
+            models.Evenement.id == event_id,
+            models.Evenement.groupeId == current_groupe.id,
+        )
+    )
+    if evenement_id is None:
+        raise HTTPException(status_code=403, detail="Événement non trouvé ou n'appartient pas à ce groupe")
+
 @router.get("/event_menus", response_model=List[schemas.EventMenu])
-def list_event_menus(
+@sql_budget(2)
+async def list_event_menus(
     event_id: int = Query(...),
     day_number: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
-    Retourne les EventMenu pour un événement donné,
+    Retourne les EventMenu pour un événement donné du groupe courant,
     optionnellement filtrés par numéro de jour.
     """
-    query = db.query(models.EventMenu).filter(models.EventMenu.event_id == event_id)
+    query = select(models.EventMenu).filter(
+        models.EventMenu.event_id == event_id,
+        models.EventMenu.groupeId == current_groupe.id,
+    )
 
     if day_number is not None:
         query = query.filter(models.EventMenu.day_number == day_number)
 
-    return query.all()
+    return fast_json.list_response(schemas.EventMenu, (await db.scalars(query)).all())
 
 @router.post("/event_menus", response_model=schemas.EventMenu, status_code=201)
-def create_event_menu(
+@sql_budget(4)
+async def create_event_menu(
     event_menu: schemas.EventMenuCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_event_menu = models.EventMenu(**event_menu.dict())
+    await _check_event_for_current_groupe(event_menu.event_id, db, current_groupe)
+
+    db_event_menu = models.EventMenu(**event_menu.dict(), groupeId=current_groupe.id)  # 🔒 groupe de l'événement
     db.add(db_event_menu)
-    db.commit()
-    db.refresh(db_event_menu)
+    await etag.bump_version(db, current_groupe.id, etag.EVENT_MENUS)
+    await db.commit()
     return db_event_menu
 
 @router.get("/event_menus/{event_menu_id}", response_model=schemas.EventMenu)
-def get_event_menu(event_menu_id: int, db: Session = Depends(get_db)):
-    event_menu = (
-        db.query(models.EventMenu)
-        .filter(models.EventMenu.id == event_menu_id)
-        .first()
-    )
-    if not event_menu:
-        raise HTTPException(status_code=404, detail="EventMenu non trouvé")
-    return event_menu
+@sql_budget(2)
+async def get_event_menu(
+    event_menu_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    return await _get_event_menu_for_current_groupe(event_menu_id, db, current_groupe)
 
 @router.put("/event_menus/{event_menu_id}", response_model=schemas.EventMenu)
-def update_event_menu(
+@sql_budget(4)
+async def update_event_menu(
     event_menu_id: int,
     event_menu: schemas.EventMenuUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_event_menu = (
-        db.query(models.EventMenu)
-        .filter(models.EventMenu.id == event_menu_id)
-        .first()
-    )
-    if not db_event_menu:
-        raise HTTPException(status_code=404, detail="EventMenu non trouvé")
-
-    for key, value in event_menu.dict(exclude_unset=True).items():
+    db_event_menu = await _get_event_menu_for_current_groupe(event_menu_id, db, current_groupe)
+
+    previous_event_id = db_event_menu.event_id
+    data = event_menu.dict(exclude_unset=True)
+    if data.get("event_id", previous_event_id) != previous_event_id:
+        # Déplacement vers un autre événement : il doit aussi appartenir au groupe
+        await _check_event_for_current_groupe(data["event_id"], db, current_groupe)
+    for key, value in data.items():
         setattr(db_event_menu, key, value)
 
-    db.commit()
-    db.refresh(db_event_menu)
+    await etag.bump_version(db, current_groupe.id, etag.EVENT_MENUS)
+    await db.commit()
     return db_event_menu
 
 @router.delete("/event_menus/{event_menu_id}", status_code=204)
-def delete_event_menu(event_menu_id: int, db: Session = Depends(get_db)):
-    event_menu = (
-        db.query(models.EventMenu)
-        .filter(models.EventMenu.id == event_menu_id)
-        .first()
-    )
-    if not event_menu:
-        raise HTTPException(status_code=404, detail="EventMenu non trouvé")
-    db.delete(event_menu)
-    db.commit()
+@sql_budget(5)
+async def delete_event_menu(
+    event_menu_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    event_menu = await _get_event_menu_for_current_groupe(event_menu_id, db, current_groupe)
+    await db.delete(event_menu)
+    await sync.record_deletions(db, current_groupe.id, etag.EVENT_MENUS, [event_menu_id])
+    await etag.bump_version(db, current_groupe.id, etag.EVENT_MENUS)
+    await db.commit()
     return
@@ -0,0 +1,162 @@
+# app/routes/v2/reservations_v2.py
+
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app import fast_json, models, schemas
+from app.database import get_async_db
+from app.routes.v2.deps import get_current_groupe  # 🔑 groupe courant via JWT
+from app.sql_budget import sql_budget
+
+router = APIRouter()
+
+# SQLSTATE d'une violation de contrainte d'exclusion (chevauchement de réservations)
+EXCLUSION_VIOLATION = "23P01"
+
+
+async def _get_reservation_for_current_groupe(
+    reservation_id: int,
+    db: AsyncSession,
+    current_groupe: models.Groupe,
+) -> models.Reservation:
+    """
+    Helper : récupère une réservation si la tente associée
+    appartient au groupe courant, sinon 404.
+    """
+    reservation = await db.scalar(
+        select(models.Reservation)
+        .filter(
+            models.Reservation.id == reservation_id,
+            models.Reservation.groupeId == current_groupe.id,
+        )
+    )
+    if not reservation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Réservation non trouvée ou accès refusé",
+        )
+    return reservation
+
+
+async def _check_reservation(reservation: schemas.ReservationBase, db: AsyncSession, current_groupe: models.Groupe):
+    """La tente et l'événement doivent appartenir au groupe courant, et fin >= debut."""
+    if reservation.fin < reservation.debut:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La date de fin doit être postérieure ou égale à la date de début",
+        )
+    tente_id = await db.scalar(
+        select(models.Tente.id).filter(
+            models.Tente.id == reservation.tenteId,
+            models.Tente.groupeId == current_groupe.id,
+        )
+    )
+    evenement_id = await db.scalar(
+        select(models.Evenement.id).filter(
+            models.Evenement.id == reservation.evenementId,
+            models.Evenement.groupeId == current_groupe.id,
+        )
+    )
+    if tente_id is None or evenement_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tente ou événement non trouvé ou n'appartient pas à ce groupe",
+        )
+
+
+async def _commit_reservation(db: AsyncSession):
+    """Commit ; un chevauchement avec une autre réservation de la tente donne une 409."""
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        sqlstate = getattr(e.orig, "sqlstate", None) or getattr(e.orig, "pgcode", None)
+        if sqlstate != EXCLUSION_VIOLATION:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La tente est déjà réservée sur cette période",
+        )
+
+
+@router.get("/reservations", response_model=List[schemas.Reservation])
+@sql_budget(2)
+async def list_reservations(
+    tenteId: Optional[int] = Query(None),
+    evenementId: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Liste les réservations des tentes du groupe courant,
+    optionnellement filtrées par tente ou par événement.
+    """
+    query = select(models.Reservation).filter(models.Reservation.groupeId == current_groupe.id)
+    if tenteId is not None:
+        query = query.filter(models.Reservation.tenteId == tenteId)
+    if evenementId is not None:
+        query = query.filter(models.Reservation.evenementId == evenementId)
+
+    reservations = (await db.scalars(query.order_by(models.Reservation.debut, models.Reservation.id))).all()
+    return fast_json.list_response(schemas.Reservation, reservations)
+
+
+@router.post("/reservations", response_model=schemas.Reservation, status_code=201)
+@sql_budget(4)
+async def create_reservation(
+    reservation: schemas.ReservationCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Réserve une tente du groupe pour un événement du groupe.
+    Les doubles réservations sont refusées par la base (contrainte d'exclusion) : 409.
+    """
+    await _check_reservation(reservation, db, current_groupe)
+
+    db_reservation = models.Reservation(**reservation.dict(), groupeId=current_groupe.id)  # 🔒 groupe de la tente
+    db.add(db_reservation)
+    await _commit_reservation(db)
+    return db_reservation
+
+
+@router.get("/reservations/{reservation_id}", response_model=schemas.Reservation)
+async def get_reservation(
+    reservation_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    return await _get_reservation_for_current_groupe(reservation_id, db, current_groupe)
+
+
+@router.put("/reservations/{reservation_id}", response_model=schemas.Reservation)
+@sql_budget(5)
+async def update_reservation(
+    reservation_id: int,
+    reservation: schemas.ReservationUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    db_reservation = await _get_reservation_for_current_groupe(reservation_id, db, current_groupe)
+    await _check_reservation(reservation, db, current_groupe)
+
+    for key, value in reservation.dict(exclude_unset=True).items():
+        setattr(db_reservation, key, value)
+
+    await _commit_reservation(db)
+    return db_reservation
+
+
+@router.delete("/reservations/{reservation_id}", status_code=204)
+async def delete_reservation(
+    reservation_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    reservation = await _get_reservation_for_current_groupe(reservation_id, db, current_groupe)
+    await db.delete(reservation)
+    await db.commit()
+    return
@@ -0,0 +1,62 @@
+# app/routes/v2/sync_v2.py
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app import fast_json, models, schemas, sync
+from app.database import get_async_db
+from app.routes.v2.deps import get_current_groupe  # 🔑 groupe courant via JWT
+from app.sql_budget import sql_budget
+
+router = APIRouter()
+
+
+@router.get("/sync", response_model=schemas.SyncResponse)
+@sql_budget(7)
+async def sync_changes(
+    since: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Synchronisation delta pour les clients hors ligne : tentes, événements, contrôles
+    et menus d'événements créés ou modifiés depuis `since`, plus les ids supprimés.
+    Sans `since`, renvoie le jeu complet (full=True).
+    Le `cursor` renvoyé est à passer dans `since` au prochain appel.
+    """
+    # Heure du serveur BDD (début de transaction) : même horloge que updated_at
+    now = await db.scalar(select(func.now()))
+    changed_since = sync.decode_sync_cursor(since)
+
+    tentes = select(models.Tente).filter(models.Tente.groupeId == current_groupe.id)
+    evenements = select(models.Evenement).filter(models.Evenement.groupeId == current_groupe.id)
+    controles = select(models.Controle).filter(models.Controle.groupeId == current_groupe.id)
+    event_menus = select(models.EventMenu).filter(models.EventMenu.groupeId == current_groupe.id)
+
+    deleted = {}
+    if changed_since is not None:
+        tentes = tentes.filter(models.Tente.updated_at >= changed_since)
+        evenements = evenements.filter(models.Evenement.updated_at >= changed_since)
+        controles = controles.filter(models.Controle.updated_at >= changed_since)
+        event_menus = event_menus.filter(models.EventMenu.updated_at >= changed_since)
+
+        tombstones = await db.execute(
+            select(models.Deletion.collection, models.Deletion.objectId).filter(
+                models.Deletion.groupeId == current_groupe.id,
+                models.Deletion.deleted_at >= changed_since,
+            )
+        )
+        for collection, object_id in tombstones:
+            deleted.setdefault(collection, []).append(object_id)
+
+    return fast_json.model_response(schemas.SyncResponse, {
+        "cursor": sync.encode_sync_cursor(now),
+        "full": changed_since is None,
+        "tentes": (await db.scalars(tentes.order_by(models.Tente.id))).all(),
+        "evenements": (await db.scalars(evenements.order_by(models.Evenement.id))).all(),
+        "controles": (await db.scalars(controles.order_by(models.Controle.id))).all(),
+        "event_menus": (await db.scalars(event_menus.order_by(models.EventMenu.id))).all(),
+        "deleted": deleted,
+    })
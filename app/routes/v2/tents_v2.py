@@ -1,50 +1,75 @@
     # app/routes/v2/tentes_v2.py
 
 import logging
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from typing import List
+import os
+from datetime import date, datetime, time, timedelta
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from sqlalchemy import delete, exists, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app import models, schemas
-from app.database import get_db
+from app import etag, fast_json, models, schemas, sync
+from app.database import get_async_db
+from app.pagination import PageParams, apply_keyset, finish_page
+from app.routes.v2.controls_v2 import latest_controles_by_tente
 from app.routes.v2.deps import get_current_groupe  # 🔑 pour récupérer le groupe depuis le token
+from app.sql_budget import sql_budget
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Clé de pagination keyset : id (unique, croissant)
+TENTE_PAGE_KEYS = (models.Tente.id,)
 
-@router.get("/tentes", response_model=List[schemas.Tente])
-def list_tentes(
-    db: Session = Depends(get_db),
+# Nombre max d'éléments par appel bulk
+TENTE_BULK_MAX = int(os.getenv("TENTE_BULK_MAX", 1000))
+
+
+@router.get("/tentes", response_model=List[schemas.TenteAvecControle], response_model_exclude_unset=True)
+@sql_budget(4)
+async def list_tentes(
+    request: Request,
+    response: Response,
+    include: Optional[str] = Query(None, pattern="^last_control$"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
     Retourne uniquement les tentes du groupe lié au token.
     Le client n'a plus besoin d'envoyer groupeId.
+    Pagination optionnelle via `limit` / `cursor` (curseur suivant dans X-Next-Cursor).
+    ETag / If-None-Match : 304 si la collection n'a pas changé.
+    `include=last_control` ajoute à chaque tente son dernier contrôle (`dernier_controle`).
     """
+    collections = (etag.TENTES, etag.CONTROLES) if include else (etag.TENTES,)
+    not_modified = await etag.check_not_modified(request, response, db, current_groupe.id, *collections)
+    if not_modified:
+        return not_modified
+
     logger.info(f"Fetching tents for groupe ID: {current_groupe.id}")
     
-    tentes = (
-        db.query(models.Tente)
-        .filter(models.Tente.groupeId == current_groupe.id)
-        .all()
-    )
+    query = select(models.Tente).filter(models.Tente.groupeId == current_groupe.id)
+    query = apply_keyset(query, TENTE_PAGE_KEYS, page)
+    tentes = finish_page((await db.scalars(query)).all(), TENTE_PAGE_KEYS, page, response)
     
     logger.info(f"Found {len(tentes)} tents for groupe {current_groupe.id}")
-    if not tentes:
-        logger.warning(f"No tents found for groupe {current_groupe.id}. Checking all tents in DB...")
-        all_tentes = db.query(models.Tente).all()
-        logger.warning(f"Total tents in DB: {len(all_tentes)}")
-        for t in all_tentes:
-            logger.warning(f"  - Tent ID {t.id}: groupeId={t.groupeId}, nom={t.nom}")
-    
-    return tentes
+
+    if include == "last_control":
+        derniers_controles = await latest_controles_by_tente(db, [tente.id for tente in tentes])
+        for tente in tentes:
+            # Attribut transitoire lu par TenteAvecControle (from_attributes)
+            tente.dernier_controle = derniers_controles.get(tente.id)
+
+    return fast_json.list_response(schemas.TenteAvecControle, tentes, response, exclude_unset=True)
 
 
 @router.post("/tentes", response_model=schemas.Tente, status_code=201)
-def create_tente(
+@sql_budget(3)
+async def create_tente(
     tente: schemas.TenteCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
     """
@@ -56,27 +81,177 @@ def create_tente(
 
     db_tente = models.Tente(**data)
     db.add(db_tente)
-    db.commit()
-    db.refresh(db_tente)
+    await etag.bump_version(db, current_groupe.id, etag.TENTES)
+    await db.commit()
     return db_tente
 
 
-def _get_tente_for_current_groupe(
+def _check_bulk_size(items: list):
+    if len(items) > TENTE_BULK_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Au plus {TENTE_BULK_MAX} tentes par requête",
+        )
+
+
+@router.post("/tentes/bulk", response_model=List[schemas.TenteBulkResult], status_code=201)
+@sql_budget(3)
+async def create_tentes_bulk(
+    tentes: List[schemas.TenteCreate],
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Crée plusieurs tentes en une transaction, avec un INSERT multi-lignes ... RETURNING.
+    Comme pour create_tente, le groupeId est forcé au groupe du token.
+    """
+    _check_bulk_size(tentes)
+    if not tentes:
+        return []
+
+    rows = [{**tente.dict(), "groupeId": current_groupe.id} for tente in tentes]  # 🔒
+    created = (
+        await db.scalars(
+            insert(models.Tente).returning(models.Tente, sort_by_parameter_order=True),
+            rows,
+        )
+    ).all()
+    await etag.bump_version(db, current_groupe.id, etag.TENTES)
+    await db.commit()
+
+    return [
+        {"index": index, "status": "created", "id": db_tente.id, "tente": db_tente}
+        for index, db_tente in enumerate(created)
+    ]
+
+
+@router.patch("/tentes/bulk", response_model=List[schemas.TenteBulkResult])
+@sql_budget(5)
+async def update_tentes_bulk(
+    tentes: List[schemas.TenteBulkUpdate],
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Met à jour plusieurs tentes en une transaction (UPDATE groupé par clé primaire).
+    Les tentes d'un autre groupe ou inexistantes sont signalées "not_found".
+    """
+    _check_bulk_size(tentes)
+    if not tentes:
+        return []
+
+    ids = {tente.id for tente in tentes}
+    owned = set(
+        (
+            await db.scalars(
+                select(models.Tente.id).filter(
+                    models.Tente.id.in_(ids),
+                    models.Tente.groupeId == current_groupe.id,
+                )
+            )
+        ).all()
+    )
+
+    rows = [
+        # On s'assure que groupeId ne soit pas modifiable
+        tente.dict(exclude_unset=True, exclude={"groupeId"})
+        for tente in tentes
+        if tente.id in owned
+    ]
+    if rows:
+        await db.execute(update(models.Tente), rows)
+        await etag.bump_version(db, current_groupe.id, etag.TENTES)
+
+    updated = {}
+    if owned:
+        updated = {
+            db_tente.id: db_tente
+            for db_tente in (
+                await db.scalars(
+                    select(models.Tente)
+                    .filter(models.Tente.id.in_(owned))
+                    .execution_options(populate_existing=True)
+                )
+            ).all()
+        }
+    await db.commit()
+
+    return [
+        {"index": index, "status": "updated", "id": tente.id, "tente": updated[tente.id]}
+        if tente.id in owned
+        else {"index": index, "status": "not_found", "id": tente.id}
+        for index, tente in enumerate(tentes)
+    ]
+
+
+@router.get("/tentes/available", response_model=List[schemas.Tente])
+@sql_budget(2)
+async def list_available_tentes(
+    debut: date = Query(...),
+    fin: date = Query(...),
+    minPlaces: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_groupe: models.Groupe = Depends(get_current_groupe),
+):
+    """
+    Tentes du groupe libres du jour `debut` au jour `fin` inclus : sans réservation
+    qui chevauche la période, et associées à aucun événement du groupe sur la période.
+    Une seule requête, servie par les index de périodes (GiST) et tentesAssociees (GIN).
+    """
+    if fin < debut:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La date de fin doit être postérieure ou égale à la date de début",
+        )
+
+    # Mêmes expressions que la contrainte ex_reservations_tente_periode, pour utiliser son index
+    reservee = exists().where(
+        models.Reservation.tenteId.isnot(None),
+        func.int4range(models.Reservation.tenteId, models.Reservation.tenteId, text("'[]'")).op("&&")(
+            func.int4range(models.Tente.id, models.Tente.id, text("'[]'"))
+        ),
+        func.daterange(models.Reservation.debut, models.Reservation.fin, text("'[]'")).op("&&")(
+            func.daterange(debut, fin, text("'[]'"))
+        ),
+    )
+    # Événements : période en timestamps, du début de `debut` à la fin de `fin`
+    periode = func.tsrange(
+        datetime.combine(debut, time.min),
+        datetime.combine(fin + timedelta(days=1), time.min),
+        text("'[)'"),
+    )
+    occupee = exists().where(
+        models.Evenement.groupeId == current_groupe.id,
+        models.Evenement.tentesAssociees.contains(array([models.Tente.id])),
+        models.evenement_periode(models.Evenement.date, models.Evenement.dateFin).op("&&")(periode),
+    )
+
+    query = select(models.Tente).filter(
+        models.Tente.groupeId == current_groupe.id,
+        ~reservee,
+        ~occupee,
+    )
+    if minPlaces is not None:
+        query = query.filter(models.Tente.nbPlaces >= minPlaces)
+
+    return fast_json.list_response(schemas.Tente, (await db.scalars(query.order_by(models.Tente.id))).all())
+
+
+async def _get_tente_for_current_groupe(
     tente_id: int,
-    db: Session,
+    db: AsyncSession,
     current_groupe: models.Groupe,
 ) -> models.Tente:
     """
     Helper interne : récupère la tente si elle appartient au groupe courant,
     sinon lève une 404.
     """
-    tente = (
-        db.query(models.Tente)
+    tente = await db.scalar(
+        select(models.Tente)
         .filter(
             models.Tente.id == tente_id,
             models.Tente.groupeId == current_groupe.id,
         )
-        .first()
     )
     if not tente:
         raise HTTPException(
@@ -87,22 +262,31 @@ def _get_tente_for_current_groupe(
 
 
 @router.get("/tentes/{tente_id}", response_model=schemas.Tente)
-def get_tente(
+@sql_budget(3)
+async def get_tente(
     tente_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    return _get_tente_for_current_groupe(tente_id, db, current_groupe)
+    # Existence et appartenance d'abord : 404 / 403 même avec un ETag de la collection
+    tente = await _get_tente_for_current_groupe(tente_id, db, current_groupe)
+    not_modified = await etag.check_not_modified(request, response, db, current_groupe.id, etag.TENTES)
+    if not_modified:
+        return not_modified
+    return tente
 
 
 @router.put("/tentes/{tente_id}", response_model=schemas.Tente)
-def update_tente(
+@sql_budget(4)
+async def update_tente(
     tente_id: int,
     tente: schemas.TenteUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_tente = _get_tente_for_current_groupe(tente_id, db, current_groupe)
+    db_tente = await _get_tente_for_current_groupe(tente_id, db, current_groupe)
 
     for key, value in tente.dict(exclude_unset=True).items():
         # On s'assure que groupeId ne soit pas modifiable
@@ -110,21 +294,29 @@ def update_tente(
             continue
         setattr(db_tente, key, value)
 
-    db.commit()
-    db.refresh(db_tente)
+    await etag.bump_version(db, current_groupe.id, etag.TENTES)
+    await db.commit()
     return db_tente
 
 
 @router.delete("/tentes/{tente_id}", status_code=204)
-def delete_tente(
+@sql_budget(8)
+async def delete_tente(
     tente_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_groupe: models.Groupe = Depends(get_current_groupe),
 ):
-    db_tente = _get_tente_for_current_groupe(tente_id, db, current_groupe)
+    db_tente = await _get_tente_for_current_groupe(tente_id, db, current_groupe)
 
     # On supprime aussi les contrôles liés à cette tente
-    db.query(models.Controle).filter(models.Controle.tenteId == tente_id).delete()
-    db.delete(db_tente)
-    db.commit()
+    controle_ids = (
+        await db.scalars(
+            delete(models.Controle).filter(models.Controle.tenteId == tente_id).returning(models.Controle.id)
+        )
+    ).all()
+    await db.delete(db_tente)
+    await sync.record_deletions(db, current_groupe.id, etag.CONTROLES, controle_ids)
+    await sync.record_deletions(db, current_groupe.id, etag.TENTES, [tente_id])
+    await etag.bump_version(db, current_groupe.id, etag.TENTES, etag.CONTROLES)
+    await db.commit()
     return
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import date, datetime
 
 # Groupe schemas
@@ -84,6 +84,15 @@ class Tente(TenteBase):
     class Config:
         from_attributes = True
 
+class TenteBulkUpdate(TenteUpdate):
+    id: int
+
+class TenteBulkResult(BaseModel):
+    index: int  # position de l'élément dans la requête
+    status: str  # "created", "updated" ou "not_found"
+    id: Optional[int] = None
+    tente: Optional[Tente] = None
+
 # Evenement schemas
 class EvenementBase(BaseModel):
     nom: str
@@ -141,9 +150,40 @@ class ControleUpdate(ControleBase):
 
 class Controle(ControleBase):
     id: int
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
     class Config:
         from_attributes = True
 
+class TenteAvecControle(Tente):
+    # Présent uniquement avec ?include=last_control
+    dernier_controle: Optional[Controle] = None
+
+class ControleImportError(BaseModel):
+    line: int  # numéro de ligne dans le fichier importé
+    error: str
+
+class ControleImportReport(BaseModel):
+    format: str
+    total_rows: int
+    imported: int
+    rejected: int
+    errors: List[ControleImportError]
+    errors_truncated: bool = False  # rapport limité à CONTROLE_IMPORT_MAX_ERRORS
+
+class ControlePictureUploadRequest(BaseModel):
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+
+class ControlePictureUploadUrl(BaseModel):
+    upload_url: str
+    object_name: str
+    method: str = "PUT"
+    expires_in: int
+
+class ControlePictureConfirm(BaseModel):
+    object_name: str
+
 # Menu schemas adaptés à la structure Recipe Flutter
 class MenuBase(BaseModel):
     title: str
@@ -182,4 +222,59 @@ class EventMenuUpdate(EventMenuBase):
 class EventMenu(EventMenuBase):
     id: int
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Liste de courses d'un événement
+class ShoppingListItem(BaseModel):
+    nom: str
+    quantite: float
+    unite: str  # g/kg, mL/L, pièce, ou l'unité saisie si inconnue
+
+class ShoppingListDay(BaseModel):
+    day_number: int
+    items: List[ShoppingListItem]
+
+class ShoppingList(BaseModel):
+    evenement_id: int
+    personnes: int  # effectif utilisé pour les repas sans quantite_personnes
+    items: List[ShoppingListItem]
+    jours: List[ShoppingListDay]
+    non_quantifies: int  # ingrédients ignorés (quantité ou nom manquant)
+
+# Tableau de bord d'un événement
+class DashboardTente(BaseModel):
+    tente: Tente
+    dernier_controle: Optional[Controle] = None
+
+class DashboardMenu(BaseModel):
+    id: int
+    title: str
+    category: Optional[str] = None
+    class Config:
+        from_attributes = True
+
+class DashboardRepas(BaseModel):
+    event_menu_id: int
+    type_repas: str
+    quantite_personnes: Optional[int] = None
+    menu: DashboardMenu
+
+class DashboardJour(BaseModel):
+    day_number: int
+    repas: List[DashboardRepas]
+
+class EvenementDashboard(BaseModel):
+    evenement: Evenement
+    tentes: List[DashboardTente]
+    etats: Dict[str, int]  # nombre de tentes par état
+    jours: List[DashboardJour]
+
+# Synchronisation delta (/v2/sync)
+class SyncResponse(BaseModel):
+    cursor: str  # à renvoyer tel quel dans ?since= au prochain appel
+    full: bool  # True : jeu complet (pas de since), le client remplace ses données locales
+    tentes: List[Tente]
+    evenements: List[Evenement]
+    controles: List[Controle]
+    event_menus: List[EventMenu]
+    deleted: Dict[str, List[int]]  # collection -> ids supprimés depuis le curseur
\ No newline at end of file
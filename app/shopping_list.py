@@ -0,0 +1,115 @@
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.cache import TTLCache
+
+# Listes de courses calculées, indexées par (evenement_id, personnes, version des event_menus
+# du groupe, version du catalogue de menus). Les versions (collection_versions) sont incrémentées
+# en base à chaque écriture : une modification faite par un autre worker change la clé, sans
+# invalidation à propager. Les entrées périmées ne sont plus lues et expirent avec le TTL.
+shopping_list_cache = TTLCache(
+    maxsize=int(os.getenv("SHOPPING_LIST_CACHE_MAXSIZE", 256)),
+    ttl=float(os.getenv("SHOPPING_LIST_CACHE_TTL", 300)),
+)
+
+# Unité saisie -> (unité de base, facteur)
+UNITS = {
+    "mg": ("g", 0.001),
+    "g": ("g", 1),
+    "gr": ("g", 1),
+    "kg": ("g", 1000),
+    "ml": ("mL", 1),
+    "cl": ("mL", 10),
+    "dl": ("mL", 100),
+    "l": ("mL", 1000),
+    "": ("pièce", 1),
+    "pc": ("pièce", 1),
+    "pcs": ("pièce", 1),
+    "piece": ("pièce", 1),
+    "pieces": ("pièce", 1),
+    "pièce": ("pièce", 1),
+    "pièces": ("pièce", 1),
+    "u": ("pièce", 1),
+    "unite": ("pièce", 1),
+    "unites": ("pièce", 1),
+    "unité": ("pièce", 1),
+    "unités": ("pièce", 1),
+}
+
+# Unité de base -> (unité d'affichage au-delà du seuil, seuil)
+DISPLAY_UNITS = {"g": ("kg", 1000), "mL": ("L", 1000)}
+
+
+def normalize_unit(unit: Optional[str]) -> Tuple[str, float]:
+    raw = (unit or "").strip()
+    key = raw.lower().rstrip(".")
+    if key in UNITS:
+        return UNITS[key]
+    return raw, 1  # unité inconnue (ex. "c. à soupe") : conservée telle quelle
+
+
+def parse_quantity(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip().replace(",", "."))
+        except ValueError:
+            return None
+    return None
+
+
+def _format_items(totals: Dict[Tuple[str, str], float], names: Dict[str, str]) -> List[dict]:
+    items = []
+    for (key, unit), quantity in sorted(totals.items()):
+        display_unit, threshold = DISPLAY_UNITS.get(unit, (unit, None))
+        if threshold is not None and quantity >= threshold:
+            quantity /= threshold
+        else:
+            display_unit = unit
+        items.append({"nom": names[key], "quantite": round(quantity, 3), "unite": display_unit})
+    return items
+
+
+def build_shopping_list(evenement_id: int, rows: Iterable[Tuple], personnes: int) -> dict:
+    """
+    Agrège en un seul passage les lignes (day_number, quantite_personnes, ingredients)
+    des repas de l'événement : quantité par personne x nombre de personnes du repas
+    (`personnes` si le repas n'en précise pas), sommée par ingrédient et unité de base.
+    """
+    totals = defaultdict(float)
+    per_day = defaultdict(lambda: defaultdict(float))
+    names = {}
+    skipped = 0
+
+    for day_number, quantite_personnes, ingredients in rows:
+        covers = quantite_personnes if quantite_personnes is not None else personnes
+        for ingredient in ingredients or []:
+            if not isinstance(ingredient, dict) or not str(ingredient.get("nom") or "").strip():
+                skipped += 1
+                continue
+            quantity = parse_quantity(ingredient.get("quantite"))
+            if quantity is None:
+                skipped += 1
+                continue
+            name = str(ingredient["nom"]).strip()
+            key = name.lower()
+            names.setdefault(key, name)
+            unit, factor = normalize_unit(ingredient.get("unite"))
+            amount = quantity * factor * covers
+            totals[(key, unit)] += amount
+            per_day[day_number][(key, unit)] += amount
+
+    return {
+        "evenement_id": evenement_id,
+        "personnes": personnes,
+        "items": _format_items(totals, names),
+        "jours": [
+            {"day_number": day_number, "items": _format_items(per_day[day_number], names)}
+            for day_number in sorted(per_day)
+        ],
+        "non_quantifies": skipped,
+    }
@@ -0,0 +1,105 @@
+import contextlib
+import contextvars
+import logging
+import os
+from collections import Counter
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+
+# "off" (défaut) : aucun suivi ; "warn" : journalise les dépassements ; "raise" : lève SQLBudgetExceeded (tests)
+SQL_BUDGET_MODE = os.getenv("SQL_BUDGET_MODE", "off").lower()
+# Même texte SQL exécuté au moins N fois dans une requête HTTP (paramètres différents) : N+1 probable
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", 3))
+# Budget des routes sans @sql_budget (0 : pas de budget, seule la détection N+1 s'applique)
+SQL_BUDGET_DEFAULT = int(os.getenv("SQL_BUDGET_DEFAULT", 0))
+
+logger = logging.getLogger(__name__)
+
+# Listes qui collectent les requêtes SQL du contexte courant (une par track_statements actif) :
+# propagé aux threads et aux greenlets
+_statements: contextvars.ContextVar[tuple] = contextvars.ContextVar("sql_budget_statements", default=())
+
+
+class SQLBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_budget(max_statements: int = 0, allow_repeats: bool = False):
+    """
+    Déclare le nombre maximum de requêtes SQL d'une route, authentification comprise
+    (groupe absent du cache). Vérifié quand SQL_BUDGET_MODE vaut "warn" ou "raise".
+    `allow_repeats` : route qui traite par lots (mêmes requêtes répétées par construction).
+    """
+
+    def decorator(endpoint):
+        endpoint.sql_budget = max_statements
+        endpoint.sql_allow_repeats = allow_repeats
+        return endpoint
+
+    return decorator
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    for statements in _statements.get():
+        statements.append(statement)
+
+
+@contextlib.contextmanager
+def track_statements() -> Iterator[List[str]]:
+    """
+    Collecte les requêtes SQL émises dans ce contexte (banc de charge, middleware).
+    Imbricable : chaque niveau reçoit toutes les requêtes de son contexte.
+    """
+    statements = []
+    token = _statements.set(_statements.get() + (statements,))
+    try:
+        yield statements
+    finally:
+        _statements.reset(token)
+
+
+def instrument_sql(engine):
+    """Branche le comptage sur `engine` (moteur sync ou `async_engine.sync_engine`)."""
+    event.listen(engine, "before_cursor_execute", _record)
+
+
+def find_problems(statements: List[str], budget: int, repeat_threshold: Optional[int] = SQL_REPEAT_THRESHOLD) -> List[str]:
+    problems = []
+    if budget and len(statements) > budget:
+        problems.append(f"{len(statements)} requêtes SQL pour un budget de {budget}")
+    for statement, count in Counter(statements).items():
+        if repeat_threshold and count >= repeat_threshold:
+            problems.append(f"même requête exécutée {count} fois (N+1 ?) : {' '.join(statement.split())[:200]}")
+    return problems
+
+
+class SQLBudgetMiddleware:
+    """
+    Middleware ASGI de dev / test : compte les requêtes SQL de chaque requête HTTP,
+    signale les dépassements du budget de la route et les requêtes répétées.
+    Sans effet quand SQL_BUDGET_MODE vaut "off".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if SQL_BUDGET_MODE == "off" or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_statements() as statements:
+            await self.app(scope, receive, send)
+
+        route = scope.get("route")
+        endpoint = getattr(route, "endpoint", None)
+        budget = getattr(endpoint, "sql_budget", SQL_BUDGET_DEFAULT)
+        repeat_threshold = None if getattr(endpoint, "sql_allow_repeats", False) else SQL_REPEAT_THRESHOLD
+        problems = find_problems(statements, budget, repeat_threshold)
+        if not problems:
+            return
+        message = f"{scope['method']} {getattr(route, 'path', scope['path'])} : " + " ; ".join(problems)
+        if SQL_BUDGET_MODE == "raise":
+            raise SQLBudgetExceeded(message)
+        logger.warning(message)
@@ -1,42 +1,249 @@
 import os
 import io
-from typing import Optional
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import BinaryIO, Optional
+
+import anyio
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 
+from app import metrics
+
 MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT", "localhost:9000")
 MINIO_ACCESS_KEY = os.environ.get("MINIO_ROOT_USER")
 MINIO_SECRET_KEY = os.environ.get("MINIO_ROOT_PASSWORD")
 MINIO_SECURE = os.environ.get("MINIO_SECURE", "false").lower() in ("1", "true", "yes")
 MINIO_PUBLIC_ENDPOINT = os.environ.get("MINIO_PUBLIC_ENDPOINT", None)
+MINIO_REGION = os.environ.get("MINIO_REGION", "us-east-1")
+# Durée de validité des URLs pré-signées d'upload direct
+MINIO_PRESIGN_EXPIRES = int(os.environ.get("MINIO_PRESIGN_EXPIRES", 900))
+# Taille des parts d'un upload multipart (S3 impose au moins 5 MiB) : borne la mémoire par upload
+MINIO_PART_SIZE = max(int(os.environ.get("MINIO_PART_SIZE", 5 * 1024 * 1024)), 5 * 1024 * 1024)
+
+# Timeouts (secondes) : connexion, opérations courtes (bucket, stat), transferts (lecture socket)
+MINIO_CONNECT_TIMEOUT = float(os.environ.get("MINIO_CONNECT_TIMEOUT", 3))
+MINIO_READ_TIMEOUT = float(os.environ.get("MINIO_READ_TIMEOUT", 10))
+MINIO_TRANSFER_TIMEOUT = float(os.environ.get("MINIO_TRANSFER_TIMEOUT", 60))
+MINIO_RETRIES = int(os.environ.get("MINIO_RETRIES", 2))
+# Connexions HTTP gardées ouvertes vers MinIO, partagées par tous les threads
+MINIO_HTTP_POOL_SIZE = int(os.environ.get("MINIO_HTTP_POOL_SIZE", 16))
+# Nombre max de threads occupés en même temps par le stockage (le reste du threadpool reste libre)
+MINIO_MAX_CONCURRENCY = int(os.environ.get("MINIO_MAX_CONCURRENCY", 8))
 
 _client: Optional[Minio] = None
+_meta_client: Optional[Minio] = None
+_presign_client: Optional[Minio] = None
+_limiter: Optional[anyio.CapacityLimiter] = None
+
+_known_buckets: set = set()
+_bucket_lock = threading.Lock()
+
+
+class _OperationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops = {}
+
+    def record(self, operation: str, seconds: float, error: bool):
+        with self._lock:
+            op = self._ops.setdefault(operation, {"count": 0, "errors": 0, "total": 0.0, "max": 0.0})
+            op["count"] += 1
+            op["errors"] += int(error)
+            op["total"] += seconds
+            op["max"] = max(op["max"], seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": op["count"],
+                    "errors": op["errors"],
+                    "avg_ms": round(op["total"] / op["count"] * 1000, 3) if op["count"] else None,
+                    "max_ms": round(op["max"] * 1000, 3),
+                }
+                for name, op in self._ops.items()
+            }
+
+
+_stats = _OperationStats()
+
+
+@contextmanager
+def _timed(operation: str):
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _stats.record(operation, elapsed, error)
+        metrics.observe_storage(operation, elapsed, error)
+
+
+def get_stats() -> dict:
+    return {"known_buckets": len(_known_buckets), "operations": _stats.snapshot()}
+
+
+def _http_client(read_timeout: float) -> urllib3.PoolManager:
+    return urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=MINIO_CONNECT_TIMEOUT, read=read_timeout),
+        maxsize=MINIO_HTTP_POOL_SIZE,
+        retries=urllib3.Retry(
+            total=MINIO_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    )
+
+
+def _make_client(read_timeout: float) -> Minio:
+    if not MINIO_ACCESS_KEY or not MINIO_SECRET_KEY:
+        raise RuntimeError("MINIO_ROOT_USER and MINIO_ROOT_PASSWORD must be set in environment")
+    return Minio(
+        MINIO_ENDPOINT,
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        secure=MINIO_SECURE,
+        region=MINIO_REGION,
+        http_client=_http_client(read_timeout),
+    )
 
 def get_client() -> Minio:
+    """Client des transferts (put/get), avec un timeout de lecture adapté aux gros objets."""
     global _client
     if _client is None:
+        _client = _make_client(MINIO_TRANSFER_TIMEOUT)
+    return _client
+
+def _get_meta_client() -> Minio:
+    """Client des opérations courtes (bucket, stat) : un MinIO lent échoue vite."""
+    global _meta_client
+    if _meta_client is None:
+        _meta_client = _make_client(MINIO_READ_TIMEOUT)
+    return _meta_client
+
+def get_presign_client() -> Minio:
+    """
+    Client dédié à la signature d'URLs : il vise l'endpoint public (celui que
+    joignent les apps) et connaît la région, donc signer ne fait aucun appel réseau.
+    """
+    global _presign_client
+    if _presign_client is None:
         if not MINIO_ACCESS_KEY or not MINIO_SECRET_KEY:
             raise RuntimeError("MINIO_ROOT_USER and MINIO_ROOT_PASSWORD must be set in environment")
-        _client = Minio(
-            MINIO_ENDPOINT,
+        endpoint, secure = MINIO_ENDPOINT, MINIO_SECURE
+        if MINIO_PUBLIC_ENDPOINT:
+            endpoint = MINIO_PUBLIC_ENDPOINT.rstrip("/")
+            if endpoint.startswith("https://"):
+                endpoint, secure = endpoint[len("https://"):], True
+            elif endpoint.startswith("http://"):
+                endpoint, secure = endpoint[len("http://"):], False
+        _presign_client = Minio(
+            endpoint,
             access_key=MINIO_ACCESS_KEY,
             secret_key=MINIO_SECRET_KEY,
-            secure=MINIO_SECURE,
+            secure=secure,
+            region=MINIO_REGION,
         )
-    return _client
+    return _presign_client
 
 def ensure_bucket(bucket_name: str):
-    client = get_client()
-    found = client.bucket_exists(bucket_name)
-    if not found:
-        client.make_bucket(bucket_name)
+    # Un bucket ne disparaît pas en cours de route : on ne le vérifie qu'une fois par process
+    if bucket_name in _known_buckets:
+        return
+    with _bucket_lock:
+        if bucket_name in _known_buckets:
+            return
+        client = _get_meta_client()
+        with _timed("bucket_exists"):
+            found = client.bucket_exists(bucket_name)
+        if not found:
+            try:
+                with _timed("make_bucket"):
+                    client.make_bucket(bucket_name)
+            except S3Error as e:
+                # Créé entre-temps par un autre worker
+                if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                    raise
+        _known_buckets.add(bucket_name)
 
 def upload_bytes(bucket_name: str, object_name: str, data: bytes, content_type: Optional[str] = None):
     client = get_client()
     ensure_bucket(bucket_name)
     bio = io.BytesIO(data)
     bio.seek(0)
-    client.put_object(bucket_name, object_name, bio, length=len(data), content_type=content_type)
+    with _timed("put_object"):
+        client.put_object(bucket_name, object_name, bio, length=len(data), content_type=content_type)
+
+def upload_stream(
+    bucket_name: str,
+    object_name: str,
+    stream: BinaryIO,
+    length: int = -1,
+    content_type: Optional[str] = None,
+):
+    """
+    Envoie un flux par parts de MINIO_PART_SIZE (multipart au-delà d'une part),
+    sans jamais charger l'objet entier en mémoire. Bloquant : à appeler hors de la boucle asyncio.
+    """
+    client = get_client()
+    ensure_bucket(bucket_name)
+    with _timed("put_object_stream"):
+        client.put_object(
+            bucket_name,
+            object_name,
+            stream,
+            length=length if length is not None else -1,
+            content_type=content_type or "application/octet-stream",
+            part_size=MINIO_PART_SIZE,
+            # Une seule part en vol : la mémoire reste bornée par MINIO_PART_SIZE
+            num_parallel_uploads=1,
+        )
+
+def download_bytes(bucket_name: str, object_name: str) -> bytes:
+    with _timed("get_object"):
+        response = get_client().get_object(bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+def presigned_put_url(bucket_name: str, object_name: str, expires_seconds: int = MINIO_PRESIGN_EXPIRES) -> str:
+    return get_presign_client().presigned_put_object(
+        bucket_name, object_name, expires=timedelta(seconds=expires_seconds)
+    )
+
+def stat_object(bucket_name: str, object_name: str):
+    """Métadonnées de l'objet, ou None s'il n'existe pas."""
+    try:
+        with _timed("stat_object"):
+            return _get_meta_client().stat_object(bucket_name, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject", "NoSuchBucket"):
+            return None
+        raise
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Exécute un appel bloquant du stockage dans le threadpool, en limitant à
+    MINIO_MAX_CONCURRENCY les threads qu'il peut occuper simultanément.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(MINIO_MAX_CONCURRENCY)
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_limiter)
 
 def get_public_url(bucket_name: str, object_name: str) -> str:
     # If a public endpoint is provided, use it; otherwise derive from MINIO_ENDPOINT
@@ -0,0 +1,37 @@
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+
+from app import models
+from app.pagination import decode_cursor, encode_cursor
+
+# Marge de recouvrement appliquée au curseur : une transaction commencée avant le curseur
+# mais validée après (updated_at = début de transaction) reste visible au prochain appel.
+# Les lignes peuvent donc revenir deux fois : le client les applique de façon idempotente.
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", 60))
+
+_CURSOR_COLUMNS = (models.Deletion.deleted_at,)
+
+
+def encode_sync_cursor(instant: datetime) -> str:
+    return encode_cursor([instant])
+
+
+def decode_sync_cursor(cursor: Optional[str]) -> Optional[datetime]:
+    """Renvoie l'instant à partir duquel relire les modifications (marge incluse)."""
+    if cursor is None:
+        return None
+    (instant,) = decode_cursor(cursor, _CURSOR_COLUMNS)
+    if instant is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur de pagination invalide")
+    return instant - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+
+
+async def record_deletions(db, groupe_id: int, collection: str, ids: Iterable[int]):
+    """Enregistre les tombstones dans la transaction de la suppression."""
+    rows = [{"groupeId": groupe_id, "collection": collection, "objectId": object_id} for object_id in ids]
+    if rows:
+        await db.execute(insert(models.Deletion), rows)
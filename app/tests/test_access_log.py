@@ -0,0 +1,61 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.access_log import AccessLogMiddleware, access_logger
+
+
+class _Lines(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+
+
+@pytest.fixture
+def logged():
+    # access_logger ne propage pas vers la racine : caplog ne le voit pas
+    handler = _Lines()
+    access_logger.addHandler(handler)
+    yield handler.lines
+    access_logger.removeHandler(handler)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, sample_rate=1.0, log_body=True, body_max_bytes=64)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"recu": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_body_capture_is_bounded(client, logged):
+    payload = json.dumps({"nom": "x" * 200})
+    client.post("/echo", content=payload, headers={"Content-Type": "application/json"})
+    entry = json.loads(logged[-1])
+    assert entry["bytes_in"] == len(payload)
+    assert entry["body"] == {"omitted": "truncated", "max_bytes": 64}
+
+
+def test_sensitive_fields_and_headers_are_redacted(client, logged):
+    body = {"userlogin": "chef", "mdp": "secret1", "t": [{"token": "secret2"}]}
+    client.post("/echo", json=body, headers={"Authorization": "Bearer secret-jwt", "Cookie": "session=secret-cookie"})
+    assert json.loads(logged[-1])["body"] == {"userlogin": "chef", "mdp": "***", "t": [{"token": "***"}]}
+    assert "secret" not in logged[-1]
+
+
+def test_multipart_body_is_never_captured(client, logged):
+    client.post("/echo", files={"photo": ("tente.jpg", b'{"mdp": "secret-fichier"}', "image/jpeg")})
+    entry = json.loads(logged[-1])
+    assert "body" not in entry
+    assert entry["bytes_in"] > 0
+    assert "secret" not in logged[-1]
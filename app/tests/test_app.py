@@ -1,83 +1,439 @@
+import base64
+import uuid
+from datetime import datetime
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app import benchmark, images, init_db, models, storage, sync
+from app.database import SessionLocal, engine
 from app.main import app
+from app.routes.v2 import tents_v2
+from app.security import hash_password
+
+TENTE = {
+    "nom": "Tente Test",
+    "etat": "neuve",
+    "remarques": "Aucune",
+    "nbPlaces": 4,
+    "typeTente": "dôme",
+    "unitePreferee": "A",
+    "couleurs": ["bleu", "vert"],
+    "groupeId": 0,  # ignoré : la tente est rattachée au groupe du token
+    "estIntegree": False,
+    "equipe": None,
+    "localisation": None,
+}
+
+def _groupe_de_test(nom):
+    # Groupe de test (mot de passe haché), supprimé avec ses données en fin de module
+    models.Base.metadata.create_all(bind=engine)
+    userlogin = f"test-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        groupe = models.Groupe(userlogin=userlogin, mdp=hash_password("test"), nom=nom)
+        db.add(groupe)
+        db.commit()
+        groupe_id = groupe.id
+    yield {"id": groupe_id, "userlogin": userlogin}
+    with SessionLocal() as db:
+        for model in (models.Reservation, models.Controle, models.EventMenu, models.Evenement, models.Tente, models.CollectionVersion, models.Deletion):
+            db.execute(delete(model).where(model.groupeId == groupe_id))
+        db.execute(delete(models.Groupe).where(models.Groupe.id == groupe_id))
+        db.commit()
+
+@pytest.fixture(scope="module")
+def groupe():
+    yield from _groupe_de_test("Groupe Test")
+
+@pytest.fixture(scope="module")
+def autre_groupe():
+    # Second groupe : vérifie l'isolation entre groupes
+    yield from _groupe_de_test("Autre Groupe")
+
+@pytest.fixture(scope="module")
+def client():
+    # Une seule boucle asyncio pour le module : les connexions asyncpg du pool y restent attachées
+    with TestClient(app) as test_client:
+        yield test_client
 
-client = TestClient(app)
-
-def test_create_tente():
-    response = client.post("/tentes", json={
-        "nom": "Tente Test",
-        "uniteId": 1,
-        "etat": "neuve",
-        "remarques": "Aucune",
-        "nbPlaces": 4,
-        "typeTente": "dôme",
-        "unitePreferee": "A",
-        "couleurs": ["bleu", "vert"],
-        "groupeId": "groupe-test"
-    })
+def _login(client, groupe):
+    response = client.post("/v2/auth/login", json={"userlogin": groupe["userlogin"], "mdp": "test"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="module")
+def headers(client, groupe):
+    return _login(client, groupe)
+
+@pytest.fixture(scope="module")
+def autre_headers(client, autre_groupe):
+    return _login(client, autre_groupe)
+
+def test_create_tente(client, groupe, headers):
+    response = client.post("/v2/tentes", json=TENTE, headers=headers)
     assert response.status_code == 201
     data = response.json()
     assert data["nom"] == "Tente Test"
     assert data["etat"] == "neuve"
     assert data["couleurs"] == ["bleu", "vert"]
-    assert data["groupeId"] == "groupe-test"
+    assert data["groupeId"] == groupe["id"]
 
-def test_list_tentes():
-    response = client.get("/tentes", params={"groupeId": "test"})
+def test_list_tentes(client, headers):
+    response = client.get("/v2/tentes", headers=headers)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
-def test_get_tente_not_found():
-    response = client.get("/tentes/99999")
+def test_list_tentes_requires_token(client):
+    response = client.get("/v2/tentes")
+    assert response.status_code == 401
+
+def test_get_tente_not_found(client, headers):
+    response = client.get("/v2/tentes/99999999", headers=headers)
+    assert response.status_code == 404
+
+def test_get_tente_not_found_with_etag(client, headers):
+    # If-None-Match ne masque pas une tente inexistante derrière un 304
+    response = client.get("/v2/tentes/99999999", headers={**headers, "If-None-Match": "*"})
     assert response.status_code == 404
 
-def test_update_tente():
+def test_update_tente(client, groupe, headers):
     # Crée une tente d'abord
-    create_resp = client.post("/tentes", json={
-        "nom": "Tente Update",
-        "uniteId": 2,
-        "etat": "usée",
-        "remarques": "",
-        "nbPlaces": 2,
-        "typeTente": "tunnel",
-        "unitePreferee": "B",
-        "couleurs": ["rouge"],
-        "groupeId": "groupe-update"
-    })
+    create_resp = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Update", "etat": "usée"}, headers=headers)
     tente_id = create_resp.json()["id"]
     # Met à jour la tente
-    update_resp = client.put(f"/tentes/{tente_id}", json={
+    update_resp = client.put(f"/v2/tentes/{tente_id}", json={
+        **TENTE,
         "nom": "Tente Modifiée",
-        "uniteId": 2,
         "etat": "réparée",
         "remarques": "Réparée récemment",
-        "nbPlaces": 2,
-        "typeTente": "tunnel",
-        "unitePreferee": "B",
         "couleurs": ["jaune", "bleu"],
-        "groupeId": "groupe-update"
-    })
+    }, headers=headers)
     assert update_resp.status_code == 200
     assert update_resp.json()["nom"] == "Tente Modifiée"
     assert update_resp.json()["couleurs"] == ["jaune", "bleu"]
-    assert update_resp.json()["groupeId"] == "groupe-update"
+    assert update_resp.json()["groupeId"] == groupe["id"]
 
-def test_delete_tente():
+def test_delete_tente(client, headers):
     # Crée une tente à supprimer
-    create_resp = client.post("/tentes", json={
-        "nom": "Tente Delete",
-        "uniteId": 3,
-        "etat": "bonne",
-        "remarques": "",
-        "nbPlaces": 3,
-        "typeTente": "igloo",
-        "unitePreferee": "C",
-        "couleurs": ["noir"],
-        "groupeId": "groupe-delete"
-    })
+    create_resp = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Delete"}, headers=headers)
     tente_id = create_resp.json()["id"]
-    delete_resp = client.delete(f"/tentes/{tente_id}")
+    delete_resp = client.delete(f"/v2/tentes/{tente_id}", headers=headers)
     assert delete_resp.status_code == 204
     # Vérifie qu'elle n'existe plus
-    get_resp = client.get(f"/tentes/{tente_id}")
-    assert get_resp.status_code == 404
\ No newline at end of file
+    get_resp = client.get(f"/v2/tentes/{tente_id}", headers=headers)
+    assert get_resp.status_code == 404
+
+def test_bulk_create_forces_groupe(client, groupe, autre_groupe, headers):
+    etag_avant = client.get("/v2/tentes", headers=headers).headers["ETag"]
+    response = client.post("/v2/tentes/bulk", json=[
+        {**TENTE, "nom": "Tente Bulk 1", "groupeId": autre_groupe["id"]},
+        {**TENTE, "nom": "Tente Bulk 2"},
+    ], headers=headers)
+    assert response.status_code == 201
+    results = response.json()
+    assert [(r["index"], r["status"], r["tente"]["nom"]) for r in results] == [
+        (0, "created", "Tente Bulk 1"), (1, "created", "Tente Bulk 2"),
+    ]
+    assert all(r["tente"]["groupeId"] == groupe["id"] for r in results)
+    assert client.get("/v2/tentes", headers=headers).headers["ETag"] != etag_avant
+
+def test_bulk_update_mixed_ids(client, headers, autre_headers):
+    premiere, seconde = [
+        client.post("/v2/tentes", json={**TENTE, "nom": nom}, headers=headers).json()["id"]
+        for nom in ("Tente Bulk A", "Tente Bulk B")
+    ]
+    etrangere = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Étrangère"}, headers=autre_headers).json()["id"]
+    etag_avant = client.get("/v2/tentes", headers=headers).headers["ETag"]
+
+    response = client.patch("/v2/tentes/bulk", json=[
+        {**TENTE, "id": seconde, "nom": "Tente Bulk B2"},
+        {**TENTE, "id": etrangere, "nom": "Piratée"},
+        {**TENTE, "id": 99999999, "nom": "Inexistante"},
+        {**TENTE, "id": premiere, "nom": "Tente Bulk A2"},
+    ], headers=headers)
+    assert response.status_code == 200
+    assert [(r["index"], r["status"], r["id"], (r["tente"] or {}).get("nom")) for r in response.json()] == [
+        (0, "updated", seconde, "Tente Bulk B2"),
+        (1, "not_found", etrangere, None),
+        (2, "not_found", 99999999, None),
+        (3, "updated", premiere, "Tente Bulk A2"),
+    ]
+    assert client.get(f"/v2/tentes/{etrangere}", headers=autre_headers).json()["nom"] == "Tente Étrangère"
+    assert client.get("/v2/tentes", headers=headers).headers["ETag"] != etag_avant
+
+def test_bulk_size_limit(client, headers, monkeypatch):
+    monkeypatch.setattr(tents_v2, "TENTE_BULK_MAX", 2)
+    assert client.post("/v2/tentes/bulk", json=[TENTE] * 3, headers=headers).status_code == 422
+    assert client.patch("/v2/tentes/bulk", json=[{**TENTE, "id": 1}] * 3, headers=headers).status_code == 422
+
+def test_evenement_date_fin_avant_date(client, headers):
+    # Accepté comme avant l'index de période : la période est remise dans l'ordre
+    tente_id = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Camp"}, headers=headers).json()["id"]
+    evenement = {
+        "nom": "Camp inversé",
+        "type": "camp",
+        "date": "2030-07-14T10:00:00",
+        "dateFin": "2030-07-10T10:00:00",
+        "tentesAssociees": [tente_id],
+        "groupeId": 0,
+    }
+    create_resp = client.post("/v2/evenements", json=evenement, headers=headers)
+    assert create_resp.status_code == 201
+    update_resp = client.put(
+        f"/v2/evenements/{create_resp.json()['id']}", json={**evenement, "dateFin": "2030-07-09T10:00:00"}, headers=headers
+    )
+    assert update_resp.status_code == 200
+
+    available = client.get("/v2/tentes/available", params={"debut": "2030-07-11", "fin": "2030-07-11"}, headers=headers)
+    assert available.status_code == 200
+    assert tente_id not in [tente["id"] for tente in available.json()]
+
+def test_reservations_and_availability(client, headers):
+    reservee, camp, libre = [
+        client.post("/v2/tentes", json={**TENTE, "nom": nom}, headers=headers).json()["id"]
+        for nom in ("Tente Réservée", "Tente Camp Juillet", "Tente Libre")
+    ]
+    evenement = {
+        "nom": "Camp juillet", "type": "camp", "date": "2031-07-01T10:00:00", "dateFin": "2031-07-10T10:00:00",
+        "tentesAssociees": [camp], "groupeId": 0,
+    }
+    evenement_id = client.post("/v2/evenements", json=evenement, headers=headers).json()["id"]
+
+    def reserver(debut, fin):
+        reservation = {"tenteId": reservee, "evenementId": evenement_id, "debut": debut, "fin": fin}
+        return client.post("/v2/reservations", json=reservation, headers=headers).status_code
+
+    assert reserver("2031-07-01", "2031-07-10") == 201
+    assert reserver("2031-07-05", "2031-07-15") == 409
+    # Bornes incluses : un séjour qui commence le jour de fin du précédent chevauche
+    assert reserver("2031-07-10", "2031-07-20") == 409
+    assert reserver("2031-07-11", "2031-07-20") == 201
+    assert reserver("2031-07-25", "2031-07-21") == 400
+
+    def disponibles(debut, fin):
+        response = client.get("/v2/tentes/available", params={"debut": debut, "fin": fin}, headers=headers)
+        assert response.status_code == 200
+        return {tente["id"] for tente in response.json()} & {reservee, camp, libre}
+
+    assert disponibles("2031-07-05", "2031-07-05") == {libre}
+    assert disponibles("2031-07-20", "2031-07-20") == {camp, libre}
+    assert disponibles("2031-07-21", "2031-07-22") == {reservee, camp, libre}
+    response = client.get("/v2/tentes/available", params={"debut": "2031-07-22", "fin": "2031-07-21"}, headers=headers)
+    assert response.status_code == 400
+
+def _pages(client, path, headers, **filters):
+    ids, cursor = [], None
+    while True:
+        params = {**filters, "limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+def test_pagination_across_null_dates(client, groupe, headers):
+    # Données anciennes sans date : ni sautées, ni en fin prématurée de pagination
+    tente_id = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Pages"}, headers=headers).json()["id"]
+    with SessionLocal() as db:
+        controles = [
+            models.Controle(tenteId=tente_id, userId=1, date=date, checklist={}, groupeId=groupe["id"])
+            for date in (datetime(2024, 5, 1), None, datetime(2024, 6, 1), None)
+        ]
+        evenements = [
+            models.Evenement(nom="Camp", type="camp", date=date, dateFin=date, groupeId=groupe["id"])
+            for date in (datetime(2024, 5, 1), None, datetime(2024, 6, 1), None)
+        ]
+        db.add_all(controles + evenements)
+        db.commit()
+        controle_ids = [controle.id for controle in controles]
+        evenement_ids = [evenement.id for evenement in evenements]
+
+    listed = [i for i in _pages(client, "/v2/controles", headers) if i in controle_ids]
+    # Du plus récent au plus ancien, dates NULL en dernier
+    assert listed == [controle_ids[2], controle_ids[0], controle_ids[3], controle_ids[1]]
+    listed = [i for i in _pages(client, "/v2/evenements", headers) if i in evenement_ids]
+    assert listed == [evenement_ids[1], evenement_ids[3], evenement_ids[0], evenement_ids[2]]
+
+def test_last_control_ignores_undated(client, groupe, headers):
+    # Un contrôle sans date (données anciennes) ne masque pas le dernier contrôle daté
+    tente_id = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Dernier Contrôle"}, headers=headers).json()["id"]
+    seule_id = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Contrôle Sans Date"}, headers=headers).json()["id"]
+    with SessionLocal() as db:
+        controles = [
+            models.Controle(tenteId=tente, userId=1, date=date, checklist={}, groupeId=groupe["id"])
+            for tente, date in ((tente_id, datetime(2024, 5, 1)), (tente_id, None), (tente_id, datetime(2024, 6, 1)), (seule_id, None))
+        ]
+        db.add_all(controles)
+        db.commit()
+        controle_ids = [controle.id for controle in controles]
+
+    response = client.get("/v2/tentes", params={"include": "last_control"}, headers=headers)
+    assert response.status_code == 200
+    derniers = {tente["id"]: tente["dernier_controle"] for tente in response.json()}
+    assert derniers[tente_id]["id"] == controle_ids[2]
+    assert derniers[seule_id]["id"] == controle_ids[3]
+
+def test_shopping_list_follows_menu_and_meal_edits(client, headers):
+    # Pas d'invalidation locale : la clé de cache suit les versions en base, partagées par les workers
+    menu = {"title": "Riz test", "ingredients": [{"nom": "riz", "quantite": 100, "unite": "g"}]}
+    menu_id = client.post("/v2/menus", json=menu).json()["id"]
+    evenement = {"nom": "Camp courses", "type": "camp", "date": "2030-08-01T10:00:00", "dateFin": "2030-08-02T10:00:00", "groupeId": 0}
+    evenement_id = client.post("/v2/evenements", json=evenement, headers=headers).json()["id"]
+    repas = {"event_id": evenement_id, "menu_id": menu_id, "day_number": 1, "type_repas": "midi", "quantite_personnes": 2}
+    repas_id = client.post("/v2/event_menus", json=repas, headers=headers).json()["id"]
+
+    def items():
+        response = client.get(f"/v2/evenements/{evenement_id}/shopping-list", headers=headers)
+        assert response.status_code == 200
+        return response.json()["items"]
+
+    try:
+        assert items() == [{"nom": "riz", "quantite": 200.0, "unite": "g"}]
+        client.put(f"/v2/menus/{menu_id}", json={**menu, "ingredients": [{"nom": "riz", "quantite": 150, "unite": "g"}]})
+        assert items() == [{"nom": "riz", "quantite": 300.0, "unite": "g"}]
+        client.put(f"/v2/event_menus/{repas_id}", json={**repas, "quantite_personnes": 4}, headers=headers)
+        assert items() == [{"nom": "riz", "quantite": 600.0, "unite": "g"}]
+    finally:
+        client.delete(f"/v2/event_menus/{repas_id}", headers=headers)
+        client.delete(f"/v2/menus/{menu_id}")
+
+def test_sync_delta_and_tombstones(client, headers, monkeypatch):
+    # Sans marge de recouvrement, le curseur renvoyé exclut tout ce qui a déjà été vu
+    monkeypatch.setattr(sync, "SYNC_OVERLAP_SECONDS", 0)
+    modifiee = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Sync"}, headers=headers).json()["id"]
+    supprimee = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Sync Delete"}, headers=headers).json()["id"]
+
+    full = client.get("/v2/sync", headers=headers).json()
+    assert full["full"] is True
+    assert {modifiee, supprimee} <= {tente["id"] for tente in full["tentes"]}
+
+    creee = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Sync Nouvelle"}, headers=headers).json()["id"]
+    client.put(f"/v2/tentes/{modifiee}", json={**TENTE, "nom": "Tente Sync Modifiée"}, headers=headers)
+    client.delete(f"/v2/tentes/{supprimee}", headers=headers)
+
+    delta = client.get("/v2/sync", params={"since": full["cursor"]}, headers=headers).json()
+    assert delta["full"] is False
+    assert {tente["id"]: tente["nom"] for tente in delta["tentes"]} == {creee: "Tente Sync Nouvelle", modifiee: "Tente Sync Modifiée"}
+    assert delta["deleted"] == {"tentes": [supprimee]}
+
+    suivant = client.get("/v2/sync", params={"since": delta["cursor"]}, headers=headers).json()
+    assert suivant["tentes"] == [] and suivant["deleted"] == {}
+
+def test_sync_null_cursor(client, headers):
+    since = base64.urlsafe_b64encode(b"[null]").decode().rstrip("=")
+    response = client.get("/v2/sync", params={"since": since}, headers=headers)
+    assert response.status_code == 400
+
+def test_event_menus_isolated_between_groupes(client, headers, autre_headers):
+    menu_id = client.post("/v2/menus", json={"title": "Menu privé", "ingredients": []}).json()["id"]
+    evenement = {"nom": "Camp privé", "type": "camp", "date": "2030-09-01T10:00:00", "dateFin": "2030-09-02T10:00:00", "groupeId": 0}
+    evenement_id = client.post("/v2/evenements", json=evenement, headers=headers).json()["id"]
+    repas = {"event_id": evenement_id, "menu_id": menu_id, "day_number": 1, "type_repas": "soir"}
+    repas_id = client.post("/v2/event_menus", json=repas, headers=headers).json()["id"]
+    try:
+        assert client.get(f"/v2/event_menus/{repas_id}", headers=autre_headers).status_code == 404
+        assert client.put(f"/v2/event_menus/{repas_id}", json=repas, headers=autre_headers).status_code == 404
+        assert client.delete(f"/v2/event_menus/{repas_id}", headers=autre_headers).status_code == 404
+        assert client.get("/v2/event_menus", params={"event_id": evenement_id}, headers=autre_headers).json() == []
+        assert client.post("/v2/event_menus", json=repas, headers=autre_headers).status_code == 403
+        assert client.get(f"/v2/event_menus/{repas_id}", headers=headers).status_code == 200
+    finally:
+        client.delete(f"/v2/event_menus/{repas_id}", headers=headers)
+        client.delete(f"/v2/menus/{menu_id}")
+
+def test_backfill_groupe_ids(client, groupe, headers):
+    # Lignes créées avant la colonne groupeId : init_db la remplit depuis la tente ou l'événement
+    tente_id = client.post("/v2/tentes", json={**TENTE, "nom": "Tente Ancienne"}, headers=headers).json()["id"]
+    evenement = {"nom": "Camp ancien", "type": "camp", "date": "2020-07-01T10:00:00", "dateFin": "2020-07-02T10:00:00", "groupeId": 0}
+    evenement_id = client.post("/v2/evenements", json=evenement, headers=headers).json()["id"]
+    with SessionLocal() as db:
+        menu = models.Menu(title="Menu ancien", ingredients=[])
+        db.add(menu)
+        db.flush()
+        lignes = [
+            models.Controle(tenteId=tente_id, userId=1, date=datetime(2020, 6, 1), checklist={}),
+            models.Reservation(tenteId=tente_id, evenementId=evenement_id, debut=datetime(2020, 7, 1).date(), fin=datetime(2020, 7, 2).date()),
+            models.EventMenu(event_id=evenement_id, menu_id=menu.id, day_number=1, type_repas="midi"),
+        ]
+        db.add_all(lignes)
+        db.commit()
+        try:
+            assert [ligne.groupeId for ligne in lignes] == [None, None, None]
+            init_db.backfill_groupe_ids()
+            for ligne in lignes:
+                db.refresh(ligne)
+            assert [ligne.groupeId for ligne in lignes] == [groupe["id"]] * 3
+        finally:
+            for ligne in lignes:
+                db.delete(ligne)
+            db.delete(menu)
+            db.commit()
+
+def test_menu_search_pages_by_rank(client):
+    # Mot propre au test (lettres seules), répété pour obtenir des pertinences différentes et des ex aequo
+    mot = uuid.uuid4().hex.translate(str.maketrans("0123456789", "ghijklmnop"))
+    menus = [
+        {"title": f"{mot} {mot} {mot}"},
+        {"title": f"Salade {mot}", "allergens": ["arachides"]},
+        {"title": f"Soupe {mot}", "description": mot},
+        {"title": f"Gratin {mot}", "allergens": ["lait"]},
+        {"title": f"Curry {mot}", "allergens": None},
+        {"title": f"Poêlée {mot}", "description": mot, "allergens": ["arachides", "lait"]},
+        {"title": f"Risotto {mot}"},
+    ]
+    ids = [client.post("/v2/menus", json={**menu, "ingredients": []}).json()["id"] for menu in menus]
+    try:
+        filtres = {"q": mot, "exclude_allergens": "arachides"}
+        complet = [menu["id"] for menu in client.get("/v2/menus", params=filtres).json()]
+        pages = _pages(client, "/v2/menus", {}, **filtres)
+        # Même ordre de pertinence page par page qu'en une fois, sans doublon ni trou
+        assert pages == complet
+        assert sorted(pages) == sorted(set(ids) - {ids[1], ids[5]})
+        assert pages[0] == ids[0]
+    finally:
+        for menu_id in ids:
+            client.delete(f"/v2/menus/{menu_id}")
+
+@pytest.fixture
+def stockage(monkeypatch):
+    # Stand-in en mémoire du client MinIO (celui du banc) : pas de serveur S3 en test
+    for module, name in ((storage, "_client"), (storage, "_meta_client"), (images, "_executor")):
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(storage, "_known_buckets", set())
+    yield benchmark.install_local_object_store()
+    images.shutdown()
+
+def _controle(client, headers, nom):
+    tente_id = client.post("/v2/tentes", json={**TENTE, "nom": nom}, headers=headers).json()["id"]
+    controle = {"tenteId": tente_id, "userId": 1, "date": "2030-05-01T10:00:00", "checklist": {}, "remarques": None}
+    response = client.post("/v2/controles", json=controle, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def test_confirm_picture_outside_prefix(client, groupe, autre_groupe, headers):
+    # Refusé avant tout appel au stockage : une clé d'un autre contrôle ou d'un autre groupe
+    controle_id = _controle(client, headers, "Tente Photo")
+    for object_name in (
+        f"{autre_groupe['id']}/{controle_id}/photo.jpg",
+        f"{groupe['id']}/{controle_id + 1}/photo.jpg",
+        f"{groupe['id']}/{controle_id}/../{controle_id + 1}/photo.jpg",
+        f"{groupe['id']}/{controle_id}photo.jpg",
+    ):
+        response = client.post(f"/v2/controles/{controle_id}/picture/confirm", json={"object_name": object_name}, headers=headers)
+        assert response.status_code == 403, object_name
+
+def test_picture_renditions(client, headers, stockage):
+    controle_id = _controle(client, headers, "Tente Renditions")
+    photo = ("tente.jpg", benchmark.make_picture(1600), "image/jpeg")
+    response = client.post(f"/v2/controles/{controle_id}/picture", files={"file": photo}, headers=headers)
+    assert response.status_code == 200
+    image_url = response.json()["image_url"]
+
+    # Les tâches de fond sont terminées quand TestClient rend la réponse
+    controle = client.get(f"/v2/controles/{controle_id}", headers=headers).json()
+    assert controle["image_url"] == image_url
+    assert controle["thumbnail_url"] == image_url.rsplit(".", 1)[0] + "_thumbnail.jpg"
+    assert controle["medium_url"] == image_url.rsplit(".", 1)[0] + "_medium.jpg"
+    assert len(stockage) == 3
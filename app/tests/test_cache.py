@@ -0,0 +1,33 @@
+import time
+
+from app.cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" devient le plus récent
+    cache.set("c", 3)           # évince "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+
+def test_entries_expire_and_can_be_invalidated():
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("b")
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_zero_ttl_disables_cache():
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 0
@@ -0,0 +1,45 @@
+import io
+
+from app.controle_import import detect_format, iter_records, next_chunk
+
+
+def test_detect_format():
+    assert detect_format("historique.CSV", None) == "csv"
+    assert detect_format("export.jsonl", None) == "ndjson"
+    assert detect_format("blob", "application/x-ndjson") == "ndjson"
+    assert detect_format("notes.txt", "text/plain") is None
+
+
+def test_csv_rows_are_validated_in_chunks():
+    data = (
+        "tenteId,userId,date,checklist,remarques,image_url\n"
+        '1,2,2023-05-01T08:00:00,"{""sardines"": true}",,\n'
+        "1,2,pas-une-date,{},x,\n"
+        "1,2,2023-05-02T08:00:00,{oops,x,\n"
+    ).encode()
+    records = iter_records(io.BytesIO(data), "csv")
+
+    valid, errors, done = next_chunk(records, size=2)
+    assert not done
+    assert [line for line, _ in valid] == [2]
+    assert valid[0][1].checklist == {"sardines": True}
+    assert valid[0][1].remarques is None
+    assert errors[0][0] == 3 and errors[0][1].startswith("date")
+
+    valid, errors, done = next_chunk(records, size=2)
+    assert done
+    assert valid == [] and errors == [(4, "checklist : JSON invalide")]
+
+
+def test_ndjson_skips_blank_lines():
+    data = b'{"tenteId": 1, "userId": 1, "date": "2024-01-01T00:00:00", "checklist": {}, "remarques": null}\n\n[1]\n'
+    valid, errors, done = next_chunk(iter_records(io.BytesIO(data), "ndjson"))
+    assert done
+    assert len(valid) == 1
+    assert errors == [(3, "Objet JSON attendu")]
+
+
+def test_bad_encoding_stops_reading():
+    valid, errors, done = next_chunk(iter_records(io.BytesIO(b"\xff\xfe{}\n"), "ndjson"))
+    assert done and valid == []
+    assert errors[0][1].startswith("Encodage invalide")
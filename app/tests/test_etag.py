@@ -0,0 +1,27 @@
+from starlette.requests import Request
+
+from app.etag import _matches, make_etag
+
+
+def _request(path: str, query: str = "") -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": []})
+
+
+def test_etag_depends_on_version_and_query():
+    base = make_etag(_request("/v2/tentes"), 1, "tentes", 3)
+    assert make_etag(_request("/v2/tentes"), 1, "tentes", 3) == base
+    assert make_etag(_request("/v2/tentes"), 1, "tentes", 4) != base
+    assert make_etag(_request("/v2/tentes"), 2, "tentes", 3) != base
+    assert make_etag(_request("/v2/tentes", "limit=10"), 1, "tentes", 3) != base
+    # L'ordre des paramètres ne compte pas
+    assert make_etag(_request("/v2/controles", "a=1&b=2"), 1, "controles", 1) == make_etag(
+        _request("/v2/controles", "b=2&a=1"), 1, "controles", 1
+    )
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = 'W/"abc"'
+    assert _matches('"abc"', etag)
+    assert _matches('"zzz", W/"abc"', etag)
+    assert _matches("*", etag)
+    assert not _matches('"zzz"', etag)
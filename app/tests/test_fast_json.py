@@ -0,0 +1,66 @@
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app import fast_json, schemas
+
+
+def _reference(annotation, rows, exclude_unset=False):
+    # Chemin par défaut de FastAPI : validation du response_model, jsonable_encoder, JSONResponse
+    validated = TypeAdapter(annotation).validate_python(rows, from_attributes=True)
+    return JSONResponse(jsonable_encoder(validated, exclude_unset=exclude_unset)).body
+
+
+def _controle(id, **changes):
+    values = dict(
+        id=id, tenteId=3, userId=1, date=datetime(2024, 5, 1, 10, 30, 0, 250000),
+        checklist={"sardines": True, "toile": "déchirée", "piquets": 12, "notes": [1.5, None]},
+        remarques="Fermeture éclair à changer", image_url=None,
+        thumbnail_url="https://cdn/x_thumb.webp", medium_url=None,
+    )
+    values.update(changes)
+    return SimpleNamespace(**values)
+
+
+def _tente(id, **changes):
+    values = dict(
+        id=id, nom=f"Tente {id}", etat="ok", remarques=None, nbPlaces=4, typeTente="dôme",
+        unitePreferee=None, couleurs=["vert", "beige"], groupeId=7, estIntegree=False,
+        equipe=None, localisation="Local 2",
+    )
+    values.update(changes)
+    return SimpleNamespace(**values)
+
+
+def test_list_matches_default_serialization():
+    controles = [_controle(1), _controle(2, date=datetime(2024, 5, 2, tzinfo=timezone.utc), remarques=None)]
+    assert fast_json.dump_list(schemas.Controle, controles) == _reference(List[schemas.Controle], controles)
+
+    reservations = [SimpleNamespace(id=1, tenteId=3, evenementId=9, debut=date(2024, 7, 1), fin=date(2024, 7, 14))]
+    assert fast_json.dump_list(schemas.Reservation, reservations) == _reference(List[schemas.Reservation], reservations)
+
+
+def test_nested_and_exclude_unset():
+    # Sans include=last_control, dernier_controle est absent de la ligne et omis de la réponse
+    tentes = [_tente(1), _tente(2, dernier_controle=_controle(5)), _tente(3, dernier_controle=None)]
+    assert fast_json.dump_list(schemas.TenteAvecControle, tentes, exclude_unset=True) == _reference(
+        List[schemas.TenteAvecControle], tentes, exclude_unset=True
+    )
+
+
+def test_model_response_from_dict():
+    content = {
+        "cursor": "abc",
+        "full": True,
+        "tentes": [_tente(1)],
+        "evenements": [],
+        "controles": [_controle(1)],
+        "event_menus": [],
+        "deleted": {"tentes": [4, 5]},
+    }
+    response = fast_json.model_response(schemas.SyncResponse, content)
+    assert response.body == _reference(schemas.SyncResponse, content)
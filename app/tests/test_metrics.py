@@ -0,0 +1,44 @@
+import threading
+
+from app.metrics import Registry
+
+METRICS = {
+    "jobs_total": ("counter", "Jobs", None),
+    "job_duration_seconds": ("histogram", "Durée", (0.1, 1.0)),
+}
+
+
+def test_shards_of_all_threads_are_merged():
+    registry = Registry(METRICS)
+
+    def work():
+        for _ in range(1000):
+            registry.inc("jobs_total", (("queue", "a"),))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.inc("jobs_total", (("queue", "a"),))
+
+    assert registry.collect()[0] == {("jobs_total", (("queue", "a"),)): 4001}
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry(METRICS)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        registry.observe("job_duration_seconds", (("route", "/v2/tentes/{tente_id}"),), value)
+
+    text = registry.render()
+    assert 'job_duration_seconds_bucket{route="/v2/tentes/{tente_id}",le="0.1"} 2' in text
+    assert 'job_duration_seconds_bucket{route="/v2/tentes/{tente_id}",le="1.0"} 3' in text
+    assert 'job_duration_seconds_bucket{route="/v2/tentes/{tente_id}",le="+Inf"} 4' in text
+    assert 'job_duration_seconds_count{route="/v2/tentes/{tente_id}"} 4' in text
+    assert "# TYPE job_duration_seconds histogram" in text
+
+
+def test_label_values_are_escaped():
+    registry = Registry(METRICS)
+    registry.inc("jobs_total", (("queue", 'a"b\\c'),))
+    assert 'jobs_total{queue="a\\"b\\\\c"} 1' in registry.render()
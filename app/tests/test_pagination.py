@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip_keeps_types():
+    columns = (models.Controle.date, models.Controle.id)
+    cursor = encode_cursor([datetime(2024, 5, 1, 10, 30), 42])
+    assert decode_cursor(cursor, columns) == [datetime(2024, 5, 1, 10, 30), 42]
+
+
+def test_cursor_keeps_null_date():
+    columns = (models.Controle.date, models.Controle.id)
+    assert decode_cursor(encode_cursor([None, 42]), columns) == [None, 42]
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor([datetime(2024, 5, 1), 10**12])
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    encode_cursor([1, 2, 3]),
+    encode_cursor(["pas une date", 1]),
+    encode_cursor([datetime(2024, 5, 1), "42"]),
+    encode_cursor([datetime(2024, 5, 1), True]),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, (models.Controle.date, models.Controle.id))
+    assert exc.value.status_code == 400
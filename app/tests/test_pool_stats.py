@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.pool_stats import InstrumentedQueuePool, instrument_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_counters_follow_checkout_and_return(engine):
+    stats = instrument_engine(engine)
+
+    first, second = engine.connect(), engine.connect()
+    snapshot = stats.snapshot(engine.pool)
+    assert (snapshot["checked_out"], snapshot["overflow_in_use"], snapshot["checkouts"]) == (2, 1, 2)
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    first.close()
+    second.close()
+
+    # L'overflow rendu est fermé ; la connexion du pool est réutilisée sans en ouvrir une autre
+    with engine.connect():
+        snapshot = stats.snapshot(engine.pool)
+    assert (snapshot["checked_out"], snapshot["overflow_in_use"]) == (1, 0)
+    assert (snapshot["peak_checked_out"], snapshot["peak_overflow"]) == (2, 1)
+    assert (snapshot["checkouts"], snapshot["timeouts"], snapshot["connects"]) == (3, 1, 2)
+    assert stats.snapshot(engine.pool)["checked_out"] == 0
+
+
+def test_pool_settings_from_env():
+    # Lus à l'import de app.database : vérifiés dans un process neuf
+    env = {
+        **os.environ,
+        "DB_POOL_SIZE": "7",
+        "DB_MAX_OVERFLOW": "3",
+        "DB_POOL_TIMEOUT": "2.5",
+        "DB_POOL_RECYCLE": "-1",
+        "DB_POOL_PRE_PING": "false",
+    }
+    code = (
+        "import json; from app.database import POOL_SETTINGS, engine; "
+        "print(json.dumps([POOL_SETTINGS, engine.pool.size(), engine.pool._max_overflow, engine.pool._timeout]))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    settings, size, max_overflow, timeout = json.loads(output.splitlines()[-1])
+    assert settings == {"pool_size": 7, "max_overflow": 3, "pool_timeout": 2.5, "pool_recycle": -1, "pool_pre_ping": False}
+    assert (size, max_overflow, timeout) == (7, 3, 2.5)
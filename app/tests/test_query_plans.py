@@ -0,0 +1,249 @@
+"""
+Non-régression des plans de requêtes des routes v2 chaudes.
+
+Un Postgres jetable est démarré (initdb / pg_ctl, depuis PG_BIN ou le PATH), peuplé
+d'un jeu de données réaliste puis analysé. Chaque requête HTTP est rejouée, le SQL émis
+est capturé (événement SQLAlchemy) et passé à EXPLAIN : le test échoue sur un Seq Scan
+d'une table chaude ou sur une estimation de lignes au-delà du budget.
+"""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import ThreadedSession, get_async_db
+from app.main import app
+from app.models import Base
+from app.routes.v2.deps import group_cache
+from app.security import create_access_token
+
+PG_BIN = os.getenv("PG_BIN")
+
+GROUPES = 40
+TENTES_PAR_GROUPE = 100
+CONTROLES_PAR_TENTE = 10
+EVENEMENTS_PAR_GROUPE = 20
+MENUS = 2000
+
+# Tables qui grossissent avec les groupes : jamais de parcours séquentiel
+HOT_TABLES = {"tentes", "controles", "evenements", "reservations", "event_menus", "menus", "deletions"}
+# Une requête d'un groupe ne doit pas estimer plus de lignes que ses propres données
+DEFAULT_ROW_BUDGET = 2 * TENTES_PAR_GROUPE * CONTROLES_PAR_TENTE
+
+SEED_SQL = """
+INSERT INTO groupes (userlogin, mdp, nom)
+SELECT 'groupe' || g, 'x', 'Groupe ' || g FROM generate_series(1, :groupes) g;
+
+INSERT INTO tentes (nom, etat, "nbPlaces", "typeTente", couleurs, "groupeId", "estIntegree")
+SELECT 'Tente ' || i, (ARRAY['ok', 'abîmée', 'à réparer'])[1 + i % 3], 2 + i % 6, 'dôme',
+       ARRAY['vert'], 1 + (i - 1) / :tentes, false
+FROM generate_series(1, :groupes * :tentes) i;
+
+INSERT INTO controles ("tenteId", "userId", date, checklist, remarques, "groupeId")
+SELECT t.id, 1, timestamp '2023-01-01' + (k * 30 + t.id % 7) * interval '1 day', '{}'::json, 'RAS', t."groupeId"
+FROM tentes t, generate_series(1, :controles) k;
+
+INSERT INTO evenements (nom, date, "dateFin", type, "tentesAssociees", "groupeId")
+SELECT 'Camp ' || k, timestamp '2024-01-01' + k * interval '14 days',
+       timestamp '2024-01-03' + k * interval '14 days', 'camp',
+       ARRAY(SELECT (g - 1) * :tentes + 1 + (k * 8 + j) % :tentes FROM generate_series(0, 4) j), g
+FROM generate_series(1, :groupes) g, generate_series(0, :evenements - 1) k;
+
+INSERT INTO reservations ("tenteId", "evenementId", debut, fin, "groupeId")
+SELECT e."tentesAssociees"[1] + 5 + j, e.id, e.date::date, e."dateFin"::date, e."groupeId"
+FROM evenements e, generate_series(0, 2) j;
+
+INSERT INTO menus (title, description, instructions, category, ingredients, allergens, tags)
+SELECT initcap(plat) || ' ' || i, 'Recette de ' || plat, 'Cuire le ' || plat || ' à feu doux.',
+       (ARRAY['plat', 'dessert', 'entrée'])[1 + i % 3],
+       '[{"nom": "riz", "quantite": "100", "unite": "g"}]'::json,
+       CASE WHEN i % 4 = 0 THEN ARRAY['gluten'] END,
+       ARRAY[(ARRAY['végétarien', 'rapide', 'camp', 'feu'])[1 + i % 4]]
+FROM generate_series(1, :menus) i,
+     LATERAL (SELECT (ARRAY['lentilles', 'pâtes', 'riz', 'curry', 'soupe', 'gratin', 'salade', 'chili'])[1 + i % 8] AS plat) p;
+
+INSERT INTO event_menus (event_id, menu_id, day_number, type_repas, quantite_personnes, "groupeId")
+SELECT e.id, 1 + (e.id * 7 + d) % :menus, d, repas, 12, e."groupeId"
+FROM evenements e, generate_series(1, 3) d, unnest(ARRAY['midi', 'soir']) repas;
+
+INSERT INTO deletions ("groupeId", collection, "objectId", deleted_at)
+SELECT 1 + i % :groupes, 'tentes', 100000 + i, now() - i * interval '1 minute'
+FROM generate_series(1, 5000) i;
+"""
+
+# (nom, chemin, paramètres, budget de lignes estimées)
+CASES = [
+    ("tentes", "/v2/tentes", {}, None),
+    ("tentes_page", "/v2/tentes", {"limit": 50}, None),
+    ("tentes_last_control", "/v2/tentes", {"include": "last_control", "limit": 50}, None),
+    ("tente", "/v2/tentes/{tente}", {}, None),
+    ("tentes_available", "/v2/tentes/available", {"debut": "2024-01-15", "fin": "2024-01-20"}, None),
+    ("controles", "/v2/controles", {"limit": 50}, None),
+    ("controles_tente", "/v2/controles", {"tenteId": "{tente}"}, None),
+    ("controle", "/v2/controles/{controle}", {}, None),
+    ("evenements", "/v2/evenements", {"limit": 50}, None),
+    ("evenement", "/v2/evenements/{evenement}", {}, None),
+    ("dashboard", "/v2/evenements/{evenement}/dashboard", {}, None),
+    ("shopping_list", "/v2/evenements/{evenement}/shopping-list", {}, None),
+    ("reservations", "/v2/reservations", {"evenementId": "{evenement}"}, None),
+    ("reservation", "/v2/reservations/{reservation}", {}, None),
+    ("event_menus", "/v2/event_menus", {"event_id": "{evenement}"}, None),
+    ("event_menu", "/v2/event_menus/{event_menu}", {}, None),
+    ("menus_page", "/v2/menus", {"limit": 50}, None),
+    ("menus_search", "/v2/menus", {"q": "curry", "limit": 20}, MENUS // 4),
+    ("menus_tags", "/v2/menus", {"tags": "rapide", "limit": 20}, MENUS // 2),
+    ("sync_full", "/v2/sync", {}, None),
+]
+
+
+def _pg_tool(name):
+    if PG_BIN:
+        path = os.path.join(PG_BIN, name)
+        return path if os.access(path, os.X_OK) else None
+    return shutil.which(name)
+
+
+@pytest.fixture(scope="module")
+def pg_url(tmp_path_factory):
+    initdb, pg_ctl = _pg_tool("initdb"), _pg_tool("pg_ctl")
+    if initdb is None or pg_ctl is None:
+        pytest.skip("initdb / pg_ctl introuvables (PG_BIN ou PATH)")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        pytest.skip("initdb refuse de tourner en root")
+
+    base = tmp_path_factory.mktemp("pg")
+    data = base / "data"
+    subprocess.run(
+        [initdb, "-D", str(data), "-U", "postgres", "-A", "trust", "-E", "UTF8", "--no-sync"],
+        check=True, capture_output=True,
+    )
+    # Socket unix dans le répertoire temporaire, pas de TCP : aucun conflit de port
+    subprocess.run(
+        [pg_ctl, "-D", str(data), "-l", str(base / "postgres.log"), "-w", "-o", f"-h '' -k {base} -F", "start"],
+        check=True, capture_output=True,
+    )
+    try:
+        yield f"postgresql://postgres@/postgres?host={base}"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data), "-m", "immediate", "-w", "stop"], capture_output=True)
+
+
+@pytest.fixture(scope="module")
+def plan_db(pg_url):
+    engine = create_engine(pg_url)
+    Base.metadata.create_all(engine)
+    params = {
+        "groupes": GROUPES,
+        "tentes": TENTES_PAR_GROUPE,
+        "controles": CONTROLES_PAR_TENTE,
+        "evenements": EVENEMENTS_PAR_GROUPE,
+        "menus": MENUS,
+    }
+    with engine.begin() as conn:
+        for statement in SEED_SQL.split(";"):
+            if statement.strip():
+                conn.execute(text(statement), params)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+    with engine.connect() as conn:
+        ids = conn.execute(text("""
+            SELECT
+                (SELECT min(id) FROM tentes WHERE "groupeId" = 1) AS tente,
+                (SELECT min(id) FROM controles WHERE "groupeId" = 1) AS controle,
+                (SELECT min(id) FROM evenements WHERE "groupeId" = 1) AS evenement,
+                (SELECT min(id) FROM reservations WHERE "groupeId" = 1) AS reservation,
+                (SELECT min(id) FROM event_menus WHERE "groupeId" = 1) AS event_menu
+        """)).mappings().one()
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    SessionTest = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def _get_test_db():
+        db = ThreadedSession(SessionTest())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    app.dependency_overrides[get_async_db] = _get_test_db
+    group_cache.clear()
+    try:
+        yield engine, dict(ids), captured
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        group_cache.clear()
+        engine.dispose()
+
+
+def _explain(engine, statement, parameters):
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = cursor.fetchone()[0]
+    finally:
+        raw.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _plan_problems(engine, statements, row_budget):
+    problems = []
+    for statement, parameters in statements:
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            continue
+        for node in _walk(_explain(engine, statement, parameters)):
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                problems.append(f"Seq Scan sur {node['Relation Name']} :\n{statement}")
+            elif node["Plan Rows"] > row_budget:
+                problems.append(f"{node['Node Type']} estime {node['Plan Rows']} lignes (> {row_budget}) :\n{statement}")
+    return problems
+
+
+def _run_case(plan_db, path, params, row_budget, groupe_id=1):
+    engine, ids, captured = plan_db
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(groupe_id)})}"}
+    captured.clear()
+    response = client.get(
+        path.format(**ids),
+        params={key: str(value).format(**ids) for key, value in params.items()},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    assert captured, "aucune requête SQL capturée"
+    return _plan_problems(engine, list(captured), row_budget or DEFAULT_ROW_BUDGET)
+
+
+@pytest.mark.parametrize("path, params, row_budget", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_hot_query_plans(plan_db, path, params, row_budget):
+    problems = _run_case(plan_db, path, params, row_budget)
+    assert not problems, "\n\n".join(problems)
+
+
+def test_tentes_of_empty_groupe(plan_db):
+    engine, _, _ = plan_db
+    with engine.begin() as conn:
+        groupe_id = conn.execute(text(
+            "INSERT INTO groupes (userlogin, mdp, nom) VALUES ('vide', 'x', 'Vide') RETURNING id"
+        )).scalar_one()
+    problems = _run_case(plan_db, "/v2/tentes", {}, None, groupe_id=groupe_id)
+    assert not problems, "\n\n".join(problems)
@@ -0,0 +1,20 @@
+from app.shopping_list import build_shopping_list
+
+
+def test_units_are_normalized_and_summed_per_day():
+    rows = [
+        (1, 10, [{"nom": "Pâtes", "quantite": 120, "unite": "g"}, {"nom": "Lait", "quantite": "0,25", "unite": "L"}]),
+        (2, None, [{"nom": "pâtes", "quantite": 0.1, "unite": "kg"}, {"nom": "Oeufs", "quantite": 2, "unite": ""}]),
+        (2, None, [{"nom": "sel", "quantite": "une pincée", "unite": "g"}, {"quantite": 1}]),
+    ]
+    result = build_shopping_list(7, rows, personnes=4)
+
+    assert result["items"] == [
+        {"nom": "Lait", "quantite": 2.5, "unite": "L"},
+        {"nom": "Oeufs", "quantite": 8.0, "unite": "pièce"},
+        {"nom": "Pâtes", "quantite": 1.6, "unite": "kg"},
+    ]
+    assert [day["day_number"] for day in result["jours"]] == [1, 2]
+    assert {"nom": "Pâtes", "quantite": 400.0, "unite": "g"} in result["jours"][1]["items"]
+    assert result["non_quantifies"] == 2
+
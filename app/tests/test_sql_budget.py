@@ -0,0 +1,63 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import sql_budget
+from app.sql_budget import SQLBudgetExceeded, SQLBudgetMiddleware, find_problems
+
+
+def test_budget_exceeded():
+    problems = find_problems(["SELECT 1", "SELECT 2", "SELECT 3"], budget=2)
+    assert problems == ["3 requêtes SQL pour un budget de 2"]
+
+
+def test_nested_tracking_sees_every_statement():
+    engine = create_engine("sqlite://")
+    sql_budget.instrument_sql(engine)
+    with engine.connect() as conn, sql_budget.track_statements() as outer:
+        conn.execute(text("SELECT 1"))
+        with sql_budget.track_statements() as inner:
+            conn.execute(text("SELECT 2"))
+    assert (outer, inner) == (["SELECT 1", "SELECT 2"], ["SELECT 2"])
+    engine.dispose()
+
+
+def test_repeated_statement_is_flagged():
+    statements = ["SELECT * FROM groupes"] + ["SELECT * FROM controles\n WHERE id = %(id)s"] * 3
+    problems = find_problems(statements, budget=0, repeat_threshold=3)
+    assert problems == ["même requête exécutée 3 fois (N+1 ?) : SELECT * FROM controles WHERE id = %(id)s"]
+    assert find_problems(statements, budget=0, repeat_threshold=None) == []
+
+
+@pytest.fixture
+def budget_app(monkeypatch):
+    monkeypatch.setattr(sql_budget, "SQL_BUDGET_MODE", "raise")
+    engine = create_engine("sqlite://")
+    sql_budget.instrument_sql(engine)
+    app = FastAPI()
+    app.add_middleware(SQLBudgetMiddleware)
+
+    def run(count):
+        with engine.connect() as conn:
+            for i in range(count):
+                conn.execute(text(f"SELECT {i}"))
+
+    @app.get("/dans-le-budget")
+    @sql_budget.sql_budget(2)
+    def within_budget():
+        run(2)
+
+    @app.get("/hors-budget")
+    @sql_budget.sql_budget(2)
+    def over_budget():
+        run(3)
+
+    yield TestClient(app)
+    engine.dispose()
+
+
+def test_middleware_raises_over_budget(budget_app):
+    assert budget_app.get("/dans-le-budget").status_code == 200
+    with pytest.raises(SQLBudgetExceeded, match="GET /hors-budget : 3 requêtes SQL pour un budget de 2"):
+        budget_app.get("/hors-budget")
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app import storage
+from app.benchmark import LocalObjectStore
+
+
+class _CountingStore(LocalObjectStore):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        self.calls.append(("bucket_exists", bucket_name))
+        return super().bucket_exists(bucket_name)
+
+    def make_bucket(self, bucket_name: str):
+        self.calls.append(("make_bucket", bucket_name))
+        super().make_bucket(bucket_name)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = _CountingStore()
+    monkeypatch.setattr(storage, "_client", store)
+    monkeypatch.setattr(storage, "_meta_client", store)
+    monkeypatch.setattr(storage, "_known_buckets", set())
+    return store
+
+
+def test_bucket_checked_once_per_bucket(store):
+    store.make_bucket("photos")
+    store.calls.clear()
+
+    for _ in range(3):
+        storage.ensure_bucket("photos")
+        storage.ensure_bucket("renditions")
+
+    assert store.calls == [
+        ("bucket_exists", "photos"),
+        ("bucket_exists", "renditions"),
+        ("make_bucket", "renditions"),
+    ]
+
+
+def test_concurrent_uploads_check_bucket_once(store):
+    threads = [
+        threading.Thread(target=storage.upload_bytes, args=("photos", f"1/2/{i}.jpg", b"jpeg"))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.calls == [("bucket_exists", "photos"), ("make_bucket", "photos")]
+    assert len(store) == 8